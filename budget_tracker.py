@@ -2,14 +2,42 @@
 Budget tracking and management for model usage
 """
 
+import math
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List
+from array import array
+from collections import defaultdict
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from loguru import logger
 
 
-@dataclass
+def _compensated_add(total: float, compensation: float,
+                     value: float) -> Tuple[float, float]:
+    """Kahan summation step, returns the new total and compensation"""
+    adjusted = value - compensation
+    new_total = total + adjusted
+    return new_total, (new_total - total) - adjusted
+
+
+def _midnight_epoch(day: date) -> float:
+    """POSIX timestamp of local midnight at the start of a day"""
+    return datetime(day.year, day.month, day.day).timestamp()
+
+
+def _period_end_epochs(today: date) -> Tuple[float, float, float]:
+    """Epochs at which the current day, week and month end"""
+    day_end = _midnight_epoch(today + timedelta(days=1))
+    week_end = _midnight_epoch(today + timedelta(days=7 - today.weekday()))
+    if today.month == 12:
+        month_end = _midnight_epoch(date(today.year + 1, 1, 1))
+    else:
+        month_end = _midnight_epoch(date(today.year, today.month + 1, 1))
+    return day_end, week_end, month_end
+
+
+@dataclass(slots=True, frozen=True)
 class ExpenseRecord:
     """Record of an expense"""
     timestamp: datetime
@@ -34,16 +62,18 @@ class BudgetTracker:
         self.warning_threshold = self.budget_config.get('warning_threshold', 2.0)
         self.critical_threshold = self.budget_config.get('critical_threshold', 0.5)
         
-        # Expense tracking
-        self.expenses: List[ExpenseRecord] = []
+        # Expense tracking, stored column-wise (one entry per expense)
+        self._reset_expense_columns()
         self.daily_expenses = 0.0
         self.weekly_expenses = 0.0
         self.monthly_expenses = 0.0
+        # Kahan compensation terms keeping long-running totals exact
+        self._daily_compensation = 0.0
+        self._weekly_compensation = 0.0
+        self._monthly_compensation = 0.0
         
         # Period tracking
-        self.current_day = datetime.now().date()
-        self.current_week = self._get_week_start()
-        self.current_month = datetime.now().replace(day=1).date()
+        self._reset_periods()
         
         logger.info(f"Budget Tracker initialized: ${self.daily_budget}/day")
     
@@ -57,23 +87,26 @@ class BudgetTracker:
             model_type: Type of model used
             task_description: Description of the task
         """
-        # Check if period has changed
-        self._update_periods()
+        now = time.time()
         
-        # Create expense record
-        expense = ExpenseRecord(
-            timestamp=datetime.now(),
-            model_type=model_type,
-            cost=cost,
-            task_description=task_description[:100]
-        )
+        # Check if period has changed
+        self._update_periods(now)
         
-        self.expenses.append(expense)
+        # Append the expense to each column
+        self._timestamps_epoch.append(now)
+        self._costs.append(cost)
+        self._model_ids.append(self._model_id(model_type))
+        self._descriptions.append(task_description[:100])
+        self._successes.append(True)
         
         # Update period totals
-        self.daily_expenses += cost
-        self.weekly_expenses += cost
-        self.monthly_expenses += cost
+        self.daily_expenses, self._daily_compensation = _compensated_add(
+            self.daily_expenses, self._daily_compensation, cost)
+        self.weekly_expenses, self._weekly_compensation = _compensated_add(
+            self.weekly_expenses, self._weekly_compensation, cost)
+        self.monthly_expenses, self._monthly_compensation = _compensated_add(
+            self.monthly_expenses, self._monthly_compensation, cost)
+        self._model_breakdown[model_type] += cost
         
         logger.debug(f"Recorded expense: ${cost:.4f} for {model_type}")
     
@@ -106,37 +139,101 @@ class BudgetTracker:
             'remaining': min(daily_remaining, weekly_remaining, monthly_remaining)
         }
         
+        # Lazy formatting: the message is only rendered if a sink accepts it
         if is_critical:
-            logger.warning(f"Budget critical: ${daily_remaining:.2f} remaining")
+            logger.opt(lazy=True).warning("Budget critical: ${:.2f} remaining",
+                                          lambda: daily_remaining)
         elif is_warning:
-            logger.warning(f"Budget warning: ${daily_remaining:.2f} remaining")
+            logger.opt(lazy=True).warning("Budget warning: ${:.2f} remaining",
+                                          lambda: daily_remaining)
         
         return status
     
-    def _update_periods(self):
+    def _reset_expense_columns(self):
+        """Create empty per-expense columns"""
+        # POSIX timestamps, append-only and therefore sorted
+        self._timestamps_epoch = array('d')
+        self._costs = array('d')
+        # Model names are interned into a small vocabulary
+        self._model_ids = array('H')
+        self._model_vocab: List[str] = []
+        self._model_index: Dict[str, int] = {}
+        self._descriptions: List[str] = []
+        self._successes: List[bool] = []
+        self._model_breakdown: Dict[str, float] = defaultdict(float)
+    
+    def _model_id(self, model_type: str) -> int:
+        """Return the vocabulary index for a model type, adding it if new"""
+        model_id = self._model_index.get(model_type)
+        if model_id is None:
+            model_id = len(self._model_vocab)
+            self._model_vocab.append(model_type)
+            self._model_index[model_type] = model_id
+        return model_id
+    
+    def _build_records(self, start: int = 0) -> List[ExpenseRecord]:
+        """Materialize ExpenseRecords for expenses from index start onwards"""
+        vocab = self._model_vocab
+        return [
+            ExpenseRecord(
+                timestamp=datetime.fromtimestamp(timestamp),
+                model_type=vocab[model_id],
+                cost=cost,
+                task_description=description,
+                success=success
+            )
+            for timestamp, model_id, cost, description, success in zip(
+                self._timestamps_epoch[start:], self._model_ids[start:],
+                self._costs[start:], self._descriptions[start:],
+                self._successes[start:]
+            )
+        ]
+    
+    @property
+    def expenses(self) -> List[ExpenseRecord]:
+        """All recorded expenses, oldest first"""
+        return self._build_records()
+    
+    def _reset_periods(self):
+        """Start tracking the day, week and month containing now"""
+        today = date.today()
+        self.current_day = today
+        self.current_week = self._get_week_start()
+        self.current_month = today.replace(day=1)
+        (self._day_end_epoch, self._week_end_epoch,
+         self._month_end_epoch) = _period_end_epochs(today)
+    
+    def _update_periods(self, now: Optional[float] = None):
         """Update period tracking if day/week/month has changed"""
-        now = datetime.now()
-        today = now.date()
+        if now is None:
+            now = time.time()
+        
+        # Week and month boundaries can only be crossed when the day changes
+        if now < self._day_end_epoch:
+            return
         
-        # Check if day has changed
-        if today != self.current_day:
-            self.daily_expenses = 0.0
-            self.current_day = today
-            logger.info("New day started, resetting daily budget")
+        today = date.fromtimestamp(now)
+        self.daily_expenses = 0.0
+        self._daily_compensation = 0.0
+        self.current_day = today
+        logger.info("New day started, resetting daily budget")
         
         # Check if week has changed
-        week_start = self._get_week_start()
-        if week_start != self.current_week:
+        if now >= self._week_end_epoch:
             self.weekly_expenses = 0.0
-            self.current_week = week_start
+            self._weekly_compensation = 0.0
+            self.current_week = self._get_week_start()
             logger.info("New week started, resetting weekly budget")
         
         # Check if month has changed
-        month_start = now.replace(day=1).date()
-        if month_start != self.current_month:
+        if now >= self._month_end_epoch:
             self.monthly_expenses = 0.0
-            self.current_month = month_start
+            self._monthly_compensation = 0.0
+            self.current_month = today.replace(day=1)
             logger.info("New month started, resetting monthly budget")
+        
+        (self._day_end_epoch, self._week_end_epoch,
+         self._month_end_epoch) = _period_end_epochs(today)
     
     def _get_week_start(self) -> datetime:
         """Get start of current week (Monday)"""
@@ -148,7 +245,7 @@ class BudgetTracker:
     
     def get_total_expenses(self) -> float:
         """Get total expenses across all periods"""
-        return sum(expense.cost for expense in self.expenses)
+        return math.fsum(self._costs)
     
     def get_remaining_budget(self) -> float:
         """Get overall remaining budget (minimum across periods)"""
@@ -165,31 +262,23 @@ class BudgetTracker:
         Returns:
             List of expense records
         """
-        now = datetime.now()
-        
         if period == "day":
-            cutoff = now - timedelta(days=1)
+            window = timedelta(days=1)
         elif period == "week":
-            cutoff = now - timedelta(weeks=1)
+            window = timedelta(weeks=1)
         elif period == "month":
-            cutoff = now - timedelta(days=30)
+            window = timedelta(days=30)
         else:
-            cutoff = datetime.min
+            return self._build_records()
         
-        return [expense for expense in self.expenses 
-                if expense.timestamp >= cutoff]
+        # Expenses are recorded in time order, so bisect for the cutoff
+        cutoff = time.time() - window.total_seconds()
+        start = bisect_left(self._timestamps_epoch, cutoff)
+        return self._build_records(start)
     
     def get_model_expense_breakdown(self) -> Dict[str, float]:
         """Get expense breakdown by model type"""
-        breakdown = {}
-        
-        for expense in self.expenses:
-            model_type = expense.model_type
-            if model_type not in breakdown:
-                breakdown[model_type] = 0.0
-            breakdown[model_type] += expense.cost
-        
-        return breakdown
+        return dict(self._model_breakdown)
     
     def can_afford(self, estimated_cost: float) -> bool:
         """Check if we can afford an estimated cost"""
@@ -198,13 +287,15 @@ class BudgetTracker:
     
     def reset_budgets(self):
         """Reset all budgets (for testing/debugging)"""
-        self.expenses = []
+        self._reset_expense_columns()
         self.daily_expenses = 0.0
         self.weekly_expenses = 0.0
         self.monthly_expenses = 0.0
+        # Kahan compensation terms keeping long-running totals exact
+        self._daily_compensation = 0.0
+        self._weekly_compensation = 0.0
+        self._monthly_compensation = 0.0
         
-        self.current_day = datetime.now().date()
-        self.current_week = self._get_week_start()
-        self.current_month = datetime.now().replace(day=1).date()
+        self._reset_periods()
         
         logger.info("All budgets reset")
\ No newline at end of file
@@ -3,18 +3,104 @@ Complexity scoring for task routing
 """
 
 import re
+import string
+from collections import deque
+from math import exp
 from typing import Dict, List, Optional
-import numpy as np
 from loguru import logger
 
 
+# Patterns indicating a dependency between applications
+_INTER_APP_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'from.*to.*',
+    r'copy.*from.*to.*',
+    r'import.*into.*',
+    r'export.*from.*to.*',
+    r'search.*and.*create.*',
+))
+
+_SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+# Maps punctuation to spaces so str.split() yields bare words
+_PUNCTUATION_TABLE = str.maketrans({char: ' ' for char in string.punctuation})
+
+# Keyword sets matched against the tokens of a task description
+_APP_KEYWORDS = frozenset({'chrome', 'word', 'excel', 'notepad', 'calculator',
+                           'outlook', 'explorer', 'paint', 'powerpoint'})
+_TEXT_KEYWORDS = frozenset({'edit', 'format', 'bold', 'italic', 'underline',
+                            'align', 'paragraph', 'font', 'style'})
+_NAVIGATION_KEYWORDS = frozenset({'open', 'close', 'navigate', 'click',
+                                  'select', 'find', 'search', 'browse'})
+_DATA_KEYWORDS = frozenset({'calculate', 'sum', 'average', 'sort', 'filter',
+                            'analyze', 'graph', 'chart', 'formula', 'function'})
+_ACTION_VERBS = frozenset({'click', 'type', 'open', 'close', 'save',
+                           'create', 'delete', 'move', 'copy', 'paste'})
+_CONDITIONAL_KEYWORDS = frozenset({'if', 'then', 'else', 'when', 'unless',
+                                   'condition'})
+
+# Default feature weights, overridable via the 'complexity_weights' config
+_DEFAULT_WEIGHTS = {
+    'word_count': 0.1,
+    'app_count': 0.2,
+    'has_inter_app_dependency': 0.3,
+    'requires_text_processing': 0.15,
+    'requires_navigation': 0.1,
+    'requires_data_manipulation': 0.2,
+    'step_count_estimate': 0.15,
+    'has_conditional_logic': 0.25,
+    'historical_success_rate': 0.2,
+}
+
+# Divisors that map count features onto the 0-1 range
+_FEATURE_SCALES = {
+    'word_count': 50,
+    'app_count': 5,
+    'step_count_estimate': 20,
+}
+
+# Features where a higher value means lower complexity
+_INVERTED_FEATURES = frozenset({'historical_success_rate'})
+
+# Inflection endings and what to put back to recover the base form;
+# double consonants are also undone, so "formatting" yields "format"
+_INFLECTION_SUFFIXES = (('ies', 'y'), ('ied', 'y'), ('ing', ''), ('ing', 'e'),
+                        ('ed', ''), ('ed', 'e'), ('es', ''), ('es', 'e'), ('s', ''))
+
+# Multi-word phrases that cannot be matched as single tokens
+_NAVIGATION_PHRASE_RE = re.compile(r'\bgo to\b')
+_CONDITIONAL_PHRASE_RE = re.compile(r'\b(?:depending|based) on\b')
+
+
+def _token_forms(words: List[str]) -> frozenset:
+    """
+    Tokens plus their likely base forms
+    
+    Args:
+        words: Lowercased words of a description
+        
+    Returns:
+        Set to match keywords against, so "opening" or "words" still count
+        while whole-token matching keeps "password" from matching "word"
+    """
+    forms = set(words)
+    for word in words:
+        for suffix, replacement in _INFLECTION_SUFFIXES:
+            # Keep a stem of at least three letters
+            if len(word) > len(suffix) + 2 and word.endswith(suffix):
+                stem = word[:-len(suffix)]
+                forms.add(stem + replacement)
+                if not replacement and stem[-1] == stem[-2]:
+                    forms.add(stem[:-1])
+    return frozenset(forms)
+
+
 class ComplexityScorer:
     """Calculates complexity scores for tasks"""
     
     def __init__(self, config: dict):
         self.config = config
         self.weights = config.get('complexity_weights', {})
-        self.history = []  # Store historical scores for learning
+        self._weight_table = self._build_weight_table()
+        self.history = deque(maxlen=1000)  # Recent scores kept for learning
         logger.info("Complexity Scorer initialized")
     
     def calculate_complexity(self, task_description: str, 
@@ -57,16 +143,18 @@ class ComplexityScorer:
     def _extract_features(self, description: str, context: Optional[Dict]) -> Dict:
         """Extract complexity features from task description"""
         description_lower = description.lower()
+        words = description_lower.translate(_PUNCTUATION_TABLE).split()
+        tokens = _token_forms(words)
         
         features = {
-            'word_count': len(description.split()),
-            'app_count': self._count_apps(description_lower),
+            'word_count': len(words),
+            'app_count': self._count_apps(tokens),
             'has_inter_app_dependency': self._has_inter_app_dependency(description_lower),
-            'requires_text_processing': self._requires_text_processing(description_lower),
-            'requires_navigation': self._requires_navigation(description_lower),
-            'requires_data_manipulation': self._requires_data_manipulation(description_lower),
-            'step_count_estimate': self._estimate_step_count(description_lower),
-            'has_conditional_logic': self._has_conditional_logic(description_lower),
+            'requires_text_processing': self._requires_text_processing(tokens),
+            'requires_navigation': self._requires_navigation(tokens, description_lower),
+            'requires_data_manipulation': self._requires_data_manipulation(tokens),
+            'step_count_estimate': self._estimate_step_count(tokens, description_lower),
+            'has_conditional_logic': self._has_conditional_logic(tokens, description_lower),
         }
         
         # Add context features if available
@@ -79,35 +167,35 @@ class ComplexityScorer:
         
         return features
     
+    def _build_weight_table(self) -> tuple:
+        """Resolve weights and normalization for each feature once"""
+        weights = {**_DEFAULT_WEIGHTS, **self.weights}
+        
+        return tuple(
+            (name, weight, _FEATURE_SCALES.get(name, 1.0), name in _INVERTED_FEATURES)
+            for name, weight in weights.items()
+        )
+    
     def _calculate_weighted_score(self, features: Dict) -> float:
         """Calculate weighted complexity score"""
-        # Default weights if not configured
-        default_weights = {
-            'word_count': 0.1,
-            'app_count': 0.2,
-            'has_inter_app_dependency': 0.3,
-            'requires_text_processing': 0.15,
-            'requires_navigation': 0.1,
-            'requires_data_manipulation': 0.2,
-            'step_count_estimate': 0.15,
-            'has_conditional_logic': 0.25,
-            'historical_success_rate': 0.2,
-        }
-        
-        weights = {**default_weights, **self.weights}
-        
         score = 0.0
         total_weight = 0.0
         
-        for feature_name, weight in weights.items():
-            if feature_name in features:
-                feature_value = features[feature_name]
-                
-                # Normalize feature values
-                normalized_value = self._normalize_feature(feature_name, feature_value)
-                
-                score += normalized_value * weight
-                total_weight += weight
+        for feature_name, weight, scale, inverted in self._weight_table:
+            if feature_name not in features:
+                continue
+            
+            # Normalize feature value to 0-1 range (bools count as 0/1)
+            value = features[feature_name]
+            if not isinstance(value, (int, float)):
+                normalized_value = 0.5
+            elif inverted:
+                normalized_value = 1.0 - value
+            else:
+                normalized_value = min(value / scale, 1.0)
+            
+            score += normalized_value * weight
+            total_weight += weight
         
         # Normalize by total weight
         if total_weight > 0:
@@ -115,97 +203,50 @@ class ComplexityScorer:
         
         return score
     
-    def _normalize_feature(self, feature_name: str, value) -> float:
-        """Normalize feature value to 0-1 range"""
-        if isinstance(value, bool):
-            return 1.0 if value else 0.0
-        elif isinstance(value, (int, float)):
-            # Feature-specific normalization
-            if feature_name == 'word_count':
-                return min(value / 50, 1.0)
-            elif feature_name == 'app_count':
-                return min(value / 5, 1.0)
-            elif feature_name == 'step_count_estimate':
-                return min(value / 20, 1.0)
-            elif feature_name == 'historical_success_rate':
-                return 1.0 - value  # Lower success rate = higher complexity
-            else:
-                return min(value, 1.0)
-        else:
-            return 0.5
-    
     def _sigmoid_normalize(self, x: float) -> float:
         """Apply sigmoid function for normalization"""
-        return 1 / (1 + np.exp(-10 * (x - 0.5)))
+        return 1.0 / (1.0 + exp(-10.0 * (x - 0.5)))
     
-    def _count_apps(self, description: str) -> int:
+    def _count_apps(self, tokens: frozenset) -> int:
         """Count number of applications mentioned"""
-        apps = ['chrome', 'word', 'excel', 'notepad', 'calculator', 
-                'outlook', 'explorer', 'paint', 'powerpoint']
-        
-        return sum(1 for app in apps if app in description)
+        return len(tokens & _APP_KEYWORDS)
     
     def _has_inter_app_dependency(self, description: str) -> bool:
         """Check if task involves multiple apps with dependencies"""
-        patterns = [
-            r'from.*to.*',
-            r'copy.*from.*to.*',
-            r'import.*into.*',
-            r'export.*from.*to.*',
-            r'search.*and.*create.*',
-        ]
-        
-        return any(re.search(pattern, description) for pattern in patterns)
+        return any(pattern.search(description) for pattern in _INTER_APP_PATTERNS)
     
-    def _requires_text_processing(self, description: str) -> bool:
+    def _requires_text_processing(self, tokens: frozenset) -> bool:
         """Check if task requires text processing"""
-        keywords = ['edit', 'format', 'bold', 'italic', 'underline', 
-                   'align', 'paragraph', 'font', 'style']
-        
-        return any(keyword in description for keyword in keywords)
+        return not tokens.isdisjoint(_TEXT_KEYWORDS)
     
-    def _requires_navigation(self, description: str) -> bool:
+    def _requires_navigation(self, tokens: frozenset, description: str) -> bool:
         """Check if task requires GUI navigation"""
-        keywords = ['open', 'close', 'navigate', 'go to', 'click', 
-                   'select', 'find', 'search', 'browse']
-        
-        return any(keyword in description for keyword in keywords)
+        return (not tokens.isdisjoint(_NAVIGATION_KEYWORDS)
+                or _NAVIGATION_PHRASE_RE.search(description) is not None)
     
-    def _requires_data_manipulation(self, description: str) -> bool:
+    def _requires_data_manipulation(self, tokens: frozenset) -> bool:
         """Check if task requires data manipulation"""
-        keywords = ['calculate', 'sum', 'average', 'sort', 'filter',
-                   'analyze', 'graph', 'chart', 'formula', 'function']
-        
-        return any(keyword in description for keyword in keywords)
+        return not tokens.isdisjoint(_DATA_KEYWORDS)
     
-    def _estimate_step_count(self, description: str) -> int:
+    def _estimate_step_count(self, tokens: frozenset, description: str) -> int:
         """Estimate number of steps required"""
         # Simple heuristic based on sentence structure
-        sentences = re.split(r'[.!?]+', description)
+        sentences = _SENTENCE_SPLIT_RE.split(description)
         steps = len(sentences)
         
         # Count action verbs
-        action_verbs = ['click', 'type', 'open', 'close', 'save', 
-                       'create', 'delete', 'move', 'copy', 'paste']
-        
-        verb_count = sum(1 for verb in action_verbs if verb in description)
+        verb_count = len(tokens & _ACTION_VERBS)
         
         return max(steps, verb_count)
     
-    def _has_conditional_logic(self, description: str) -> bool:
+    def _has_conditional_logic(self, tokens: frozenset, description: str) -> bool:
         """Check if task involves conditional logic"""
-        keywords = ['if', 'then', 'else', 'when', 'unless', 
-                   'depending on', 'based on', 'condition']
-        
-        return any(keyword in description for keyword in keywords)
+        return (not tokens.isdisjoint(_CONDITIONAL_KEYWORDS)
+                or _CONDITIONAL_PHRASE_RE.search(description) is not None)
     
     def update_model_performance(self, task_description: str, 
                                model_type: str, success: bool):
         """Update scorer based on model performance"""
         # In production: Update weights based on performance
         # For demo: Simple logging
-        logger.info(f"Updating scorer: {model_type} {'succeeded' if success else 'failed'}")
-        
-        # Keep only recent history
-        if len(self.history) > 1000:
-            self.history = self.history[-1000:]
\ No newline at end of file
+        logger.info(f"Updating scorer: {model_type} {'succeeded' if success else 'failed'}")
\ No newline at end of file
@@ -2,12 +2,23 @@
 Configuration loader for PC-Agent+
 """
 
+import copy
 import yaml
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from loguru import logger
 
 
+# libyaml-backed loader/dumper when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _Loader, CSafeDumper as _Dumper
+except ImportError:  # pure-Python fallback
+    from yaml import SafeLoader as _Loader, SafeDumper as _Dumper
+
+# Parsed configs keyed by absolute path -> (mtime_ns, config)
+_CONFIG_CACHE: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
+
 class ConfigLoader:
     """Loads and manages configuration files"""
     
@@ -29,11 +40,19 @@ class ConfigLoader:
             return ConfigLoader._create_default_config()
         
         try:
+            # Reuse the parsed file until it changes on disk
+            abs_path = os.path.abspath(config_path)
+            mtime_ns = os.stat(abs_path).st_mtime_ns
+            cached = _CONFIG_CACHE.get(abs_path)
+            if cached is not None and cached[0] == mtime_ns:
+                return copy.deepcopy(cached[1])
+            
             with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
+                config = yaml.load(f, Loader=_Loader)
             
+            _CONFIG_CACHE[abs_path] = (mtime_ns, config)
             logger.info(f"Configuration loaded from {config_path}")
-            return config
+            return copy.deepcopy(config)
             
         except Exception as e:
             logger.error(f"Error loading config from {config_path}: {e}")
@@ -94,7 +113,7 @@ class ConfigLoader:
             os.makedirs(os.path.dirname(config_path), exist_ok=True)
             
             with open(config_path, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
+                yaml.dump(config, f, Dumper=_Dumper, default_flow_style=False)
             
             logger.info(f"Configuration saved to {config_path}")
             
@@ -113,14 +132,17 @@ class ConfigLoader:
         Returns:
             Merged configuration
         """
-        merged = base_config.copy()
+        merged = copy.deepcopy(base_config)
         
-        for key, value in override_config.items():
-            if (key in merged and isinstance(merged[key], dict) 
-                and isinstance(value, dict)):
-                merged[key] = ConfigLoader.merge_configs(merged[key], value)
-            else:
-                merged[key] = value
+        # Walk only the override keys, descending where both sides are dicts
+        stack = [(merged, override_config)]
+        while stack:
+            target, source = stack.pop()
+            for key, value in source.items():
+                if isinstance(value, dict) and isinstance(target.get(key), dict):
+                    stack.append((target[key], value))
+                else:
+                    target[key] = value
         
         return merged
     
@@ -3,12 +3,37 @@ Decision Agent for step-by-step action decision making
 """
 
 import re
-from typing import Dict, List, Optional, Tuple
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from loguru import logger
 
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    from json import loads as _json_loads
 
-@dataclass
+
+_COORDINATES_RE = re.compile(r'\((\d+),\s*(\d+)\)')
+_TYPE_TEXT_RE = re.compile(r'type\s+["\'](.+?)["\']')
+
+# Subtasks mentioning any of these are routed to the model
+_COMPLEX_KEYWORDS = frozenset({
+    "analyze", "summarize", "compare", "extract",
+    "translate", "calculate", "format", "organize"
+})
+
+
+@lru_cache(maxsize=256)
+def _needs_complex(subtask_lower: str) -> bool:
+    """Check a lowercased subtask for complex-reasoning keywords"""
+    # Substring match so inflections like "formatting" still count
+    return any(keyword in subtask_lower for keyword in _COMPLEX_KEYWORDS)
+
+
+@dataclass(slots=True, frozen=True)
 class Action:
     """Represents an executable action"""
     type: str  # click, type, select, drag, scroll, shortcut, stop
@@ -21,20 +46,20 @@ class DecisionAgent:
     """Makes step-by-step decisions for subtask execution"""
     
     # Supported action types
-    ACTION_TYPES = {
-        "click": {"x", "y", "button"},
-        "double_click": {"x", "y", "button"},
-        "type": {"text", "x", "y"},
-        "select": {"text", "start_x", "start_y", "end_x", "end_y"},
-        "drag": {"start_x", "start_y", "end_x", "end_y"},
-        "scroll": {"x", "y", "direction", "amount"},
-        "shortcut": {"keys"},
-        "stop": {}
+    ACTION_TYPES: Dict[str, frozenset] = {
+        "click": frozenset({"x", "y", "button"}),
+        "double_click": frozenset({"x", "y", "button"}),
+        "type": frozenset({"text", "x", "y"}),
+        "select": frozenset({"text", "start_x", "start_y", "end_x", "end_y"}),
+        "drag": frozenset({"start_x", "start_y", "end_x", "end_y"}),
+        "scroll": frozenset({"x", "y", "direction", "amount"}),
+        "shortcut": frozenset({"keys"}),
+        "stop": frozenset()
     }
     
     def __init__(self, model_client=None):
         self.model_client = model_client
-        self.action_history: List[Action] = []
+        self.action_history: Deque[Action] = deque(maxlen=64)
         logger.info("Decision Agent initialized")
     
     def decide_next_action(self, subtask: str, progress: str, 
@@ -72,13 +97,7 @@ class DecisionAgent:
     
     def _requires_complex_reasoning(self, subtask: str) -> bool:
         """Determine if subtask requires complex reasoning"""
-        complex_keywords = [
-            "analyze", "summarize", "compare", "extract", 
-            "translate", "calculate", "format", "organize"
-        ]
-        
-        subtask_lower = subtask.lower()
-        return any(keyword in subtask_lower for keyword in complex_keywords)
+        return _needs_complex(subtask.lower())
     
     def _rule_based_decision(self, context: str) -> Action:
         """Rule-based action decision"""
@@ -96,7 +115,7 @@ class DecisionAgent:
         
         if "type" in context.lower():
             # Extract text to type
-            text_match = re.search(r'type\s+["\'](.+?)["\']', context.lower())
+            text_match = _TYPE_TEXT_RE.search(context.lower())
             if text_match:
                 return Action(
                     type="type",
@@ -138,8 +157,7 @@ class DecisionAgent:
         try:
             response = self.model_client.generate(prompt)
             # Parse JSON response (simplified)
-            import json
-            data = json.loads(response)
+            data = _json_loads(response)
             
             return Action(
                 type=data["action"],
@@ -154,8 +172,7 @@ class DecisionAgent:
     
     def _extract_coordinates(self, text: str) -> Optional[Tuple[int, int]]:
         """Extract coordinates from text using regex"""
-        pattern = r'\((\d+),\s*(\d+)\)'
-        matches = re.findall(pattern, text)
+        matches = _COORDINATES_RE.findall(text)
         
         if matches:
             x, y = map(int, matches[0])
@@ -168,7 +185,8 @@ class DecisionAgent:
         if not self.action_history:
             return "No previous actions"
         
-        recent = self.action_history[-5:]  # Last 5 actions
+        # Last 5 actions, oldest first
+        recent = list(islice(reversed(self.action_history), 5))[::-1]
         formatted = []
         for i, action in enumerate(recent, 1):
             formatted.append(f"{i}. {action.type}: {action.reasoning[:50]}...")
@@ -182,7 +200,7 @@ class DecisionAgent:
             return False
         
         required_params = self.ACTION_TYPES[action.type]
-        missing_params = required_params - set(action.parameters.keys())
+        missing_params = required_params - action.parameters.keys()
         
         if missing_params:
             logger.warning(f"Missing parameters for {action.type}: {missing_params}")
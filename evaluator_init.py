@@ -2,11 +2,103 @@
 Automated Evaluation Framework for PC-Agent+
 """
 
+import re
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional, fall back to a regex scan
+    ahocorasick = None
+
 from .file_monitor import FileSystemMonitor
 from .visual_checker import VisualStateChecker
 from .process_verifier import ProcessVerifier
 
 
+# Keywords that classify a task, keyed by task type
+_TASK_KEYWORDS = {
+    'file_operations': frozenset({'save', 'create', 'delete', 'move', 'copy',
+                                  'rename', 'export', 'import'}),
+    'app_management': frozenset({'open', 'close', 'launch', 'exit', 'start',
+                                 'quit', 'run', 'execute'}),
+    'cross_app_workflows': frozenset({'chrome', 'word', 'excel', 'outlook'}),
+}
+
+
+def _build_keyword_matcher():
+    """
+    Build a single-pass multi-keyword matcher
+    
+    Returns:
+        Function mapping lowercased text to an iterator of
+        (task_type, keyword) hits
+    """
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for task_type, keywords in _TASK_KEYWORDS.items():
+            for keyword in keywords:
+                automaton.add_word(keyword, (task_type, keyword))
+        automaton.make_automaton()
+        return lambda text: (value for _, value in automaton.iter(text))
+    
+    # Lookahead alternation so overlapping keywords are all reported
+    categories = {keyword: task_type
+                  for task_type, keywords in _TASK_KEYWORDS.items()
+                  for keyword in keywords}
+    pattern = re.compile('(?=(' + '|'.join(
+        map(re.escape, sorted(categories, key=len, reverse=True))) + '))')
+    return lambda text: ((categories[m.group(1)], m.group(1))
+                         for m in pattern.finditer(text))
+
+
+_KEYWORD_MATCHER = _build_keyword_matcher()
+
+
+@dataclass(slots=True)
+class EvalResult:
+    """Outcome of a single task evaluation"""
+    task_description: str
+    task_type: str
+    file_score: float
+    visual_score: float
+    process_score: float
+    total_score: float
+    file_weight: float
+    visual_weight: float
+    process_weight: float
+    passed: bool
+    threshold: float
+    skipped_stages: List[str]
+    timestamp: str
+    
+    def to_dict(self) -> dict:
+        """Convert to the nested dictionary returned by evaluate_task"""
+        return {
+            'task_description': self.task_description,
+            'task_type': self.task_type,
+            'scores': {
+                'file': self.file_score,
+                'visual': self.visual_score,
+                'process': self.process_score,
+                'total': self.total_score
+            },
+            'weights': {
+                'file': self.file_weight,
+                'visual': self.visual_weight,
+                'process': self.process_weight
+            },
+            'passed': self.passed,
+            'threshold': self.threshold,
+            'skipped_stages': self.skipped_stages,
+            'timestamp': self.timestamp
+        }
+
+
 class HybridEvaluator:
     """Main evaluator combining multiple evaluation methods"""
     
@@ -18,8 +110,19 @@ class HybridEvaluator:
         self.file_monitor = FileSystemMonitor(config)
         self.visual_checker = VisualStateChecker(config)
         self.process_verifier = ProcessVerifier(config)
+        # Sub-evaluations are independent I/O-bound checks, run them together
+        self._pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix='evalpool')
+        # The visual checker reuses scratch buffers, so concurrent
+        # evaluate_task calls run their visual checks one at a time
+        self._visual_lock = threading.Lock()
         
-        self.evaluation_history = []
+        # Ring buffer of recent results; aggregates below cover all of them
+        self.evaluation_history = deque(maxlen=config.get('history_cap', 10000))
+        # Running aggregates so stats queries don't rescan the history
+        # Totals that are only lower bounds (a stage was skipped) are counted
+        # but kept out of score_sum
+        self._stats = {'total': 0, 'passed': 0, 'score_sum': 0.0, 'lower_bound': 0,
+                       'type_counts': Counter()}
         print("Hybrid Evaluator initialized")
     
     def evaluate_task(self, task_description: str, expected_outcome: dict, 
@@ -30,7 +133,9 @@ class HybridEvaluator:
         Args:
             task_description: Description of the task
             expected_outcome: Dictionary of expected outcomes
-            actual_outcome: Dictionary of actual outcomes
+            actual_outcome: Dictionary of actual outcomes; may carry a
+                'file_snapshot' from FileSystemMonitor.snapshot_watched() to
+                reuse across the file checks of an evaluation round
             
         Returns:
             Dictionary with evaluation results
@@ -41,88 +146,124 @@ class HybridEvaluator:
         task_type = self._classify_task_type(task_description)
         weights = self.weights.get(task_type, self.weights.get('gui_interactions', {}))
         
-        # Run individual evaluations
-        file_score = 0.0
-        visual_score = 0.0
-        process_score = 0.0
+        file_weight = weights.get('file_weight', 0.33)
+        visual_weight = weights.get('visual_weight', 0.33)
+        process_weight = weights.get('process_weight', 0.33)
+        threshold = weights.get('threshold', 0.7)
+        skipped_stages = []
+        
+        # File and process checks run concurrently first; the evaluators only
+        # read their own config and caches, so no locking is needed
+        file_future = process_future = None
         
         if 'files' in expected_outcome:
-            file_score = self.file_monitor.evaluate_files(
-                expected_outcome['files'], 
-                actual_outcome.get('files', [])
-            )
+            if file_weight:
+                file_future = self._pool.submit(
+                    self.file_monitor.evaluate_files,
+                    expected_outcome['files'], 
+                    actual_outcome.get('files', []),
+                    actual_outcome.get('file_snapshot')
+                )
+            else:
+                skipped_stages.append('file')
+        
+        if 'processes' in expected_outcome:
+            if process_weight:
+                process_future = self._pool.submit(
+                    self.process_verifier.evaluate_processes,
+                    expected_outcome['processes'],
+                    actual_outcome.get('processes', [])
+                )
+            else:
+                skipped_stages.append('process')
         
+        file_score = file_future.result() if file_future else 0.0
+        process_score = process_future.result() if process_future else 0.0
+        partial_score = file_weight * file_score + process_weight * process_score
+        
+        # Screenshot comparison is the slowest stage; only start it when its
+        # score (clamped to 0-1) can still change the pass/fail outcome, so
+        # the result never depends on thread timing
+        visual_score = 0.0
+        lower_bound = False
         if 'visual_state' in expected_outcome:
-            visual_score = self.visual_checker.evaluate_visual_state(
-                expected_outcome['visual_state'],
-                actual_outcome.get('visual_state')
-            )
+            if not visual_weight:
+                skipped_stages.append('visual')
+            elif partial_score >= threshold or partial_score + visual_weight < threshold:
+                skipped_stages.append('visual')
+                lower_bound = True
+            else:
+                visual_score = self._evaluate_visual(
+                    expected_outcome['visual_state'],
+                    actual_outcome.get('visual_state')
+                )
         
-        if 'processes' in expected_outcome:
-            process_score = self.process_verifier.evaluate_processes(
-                expected_outcome['processes'],
-                actual_outcome.get('processes', [])
-            )
-        
-        # Calculate weighted score
-        total_score = (
-            weights.get('file_weight', 0.33) * file_score +
-            weights.get('visual_weight', 0.33) * visual_score +
-            weights.get('process_weight', 0.33) * process_score
-        )
+        # Calculate weighted score (a lower bound if the visual stage was skipped)
+        total_score = partial_score + visual_weight * visual_score
         
         # Determine pass/fail
-        threshold = weights.get('threshold', 0.7)
         passed = total_score >= threshold
         
         # Create evaluation result
-        result = {
-            'task_description': task_description,
-            'task_type': task_type,
-            'scores': {
-                'file': file_score,
-                'visual': visual_score,
-                'process': process_score,
-                'total': total_score
-            },
-            'weights': {
-                'file': weights.get('file_weight', 0.33),
-                'visual': weights.get('visual_weight', 0.33),
-                'process': weights.get('process_weight', 0.33)
-            },
-            'passed': passed,
-            'threshold': threshold,
-            'timestamp': self._get_timestamp()
-        }
+        result = EvalResult(
+            task_description=task_description,
+            task_type=task_type,
+            file_score=file_score,
+            visual_score=visual_score,
+            process_score=process_score,
+            total_score=total_score,
+            file_weight=file_weight,
+            visual_weight=visual_weight,
+            process_weight=process_weight,
+            passed=passed,
+            threshold=threshold,
+            skipped_stages=skipped_stages,
+            timestamp=self._get_timestamp()
+        )
         
         # Store in history
         self.evaluation_history.append(result)
+        stats = self._stats
+        stats['total'] += 1
+        stats['passed'] += passed
+        if lower_bound:
+            stats['lower_bound'] += 1
+        else:
+            stats['score_sum'] += total_score
+        stats['type_counts'][task_type] += 1
         
         print(f"Evaluation complete: {'PASS' if passed else 'FAIL'} "
               f"(score: {total_score:.2f})")
         
-        return result
+        return result.to_dict()
+    
+    def _evaluate_visual(self, expected_state: dict, actual_state: dict) -> float:
+        """Run the visual check, clamped to [0, 1] (SSIM can go negative)"""
+        with self._visual_lock:
+            score = self.visual_checker.evaluate_visual_state(expected_state, actual_state)
+        return min(max(score, 0.0), 1.0)
     
     def _classify_task_type(self, task_description: str) -> str:
         """Classify task type based on description"""
         desc_lower = task_description.lower()
         
-        # Check for file operations
-        file_keywords = ['save', 'create', 'delete', 'move', 'copy', 
-                        'rename', 'export', 'import']
-        if any(keyword in desc_lower for keyword in file_keywords):
-            return 'file_operations'
+        # One lazy pass over the description
+        has_app_management = False
+        apps = set()
+        for task_type, keyword in _KEYWORD_MATCHER(desc_lower):
+            # File operations take priority, so stop scanning at the first hit
+            if task_type == 'file_operations':
+                return 'file_operations'
+            if task_type == 'app_management':
+                has_app_management = True
+            else:
+                apps.add(keyword)
         
-        # Check for app management
-        app_keywords = ['open', 'close', 'launch', 'exit', 'start', 
-                       'quit', 'run', 'execute']
-        if any(keyword in desc_lower for keyword in app_keywords):
+        if has_app_management:
             return 'app_management'
         
-        # Check for cross-app workflows
-        app_count = len([app for app in ['chrome', 'word', 'excel', 'outlook'] 
-                        if app in desc_lower])
-        if app_count > 1:
+        # Cross-app workflows mention more than one application
+        if len(apps) > 1:
             return 'cross_app_workflows'
         
         # Default to GUI interactions
@@ -130,18 +271,19 @@ class HybridEvaluator:
     
     def _get_timestamp(self) -> str:
         """Get current timestamp as string"""
-        from datetime import datetime
-        return datetime.now().isoformat()
+        return datetime.now(timezone.utc).isoformat(timespec='seconds')
     
     def get_evaluation_stats(self) -> dict:
         """Get evaluation statistics"""
-        if not self.evaluation_history:
+        stats = self._stats
+        total = stats['total']
+        if not total:
             return {'total': 0, 'passed': 0, 'failed': 0, 'avg_score': 0}
         
-        total = len(self.evaluation_history)
-        passed = sum(1 for result in self.evaluation_history if result['passed'])
-        avg_score = sum(result['scores']['total'] 
-                       for result in self.evaluation_history) / total
+        passed = stats['passed']
+        # Average over exact totals only; lower bounds would bias it down
+        scored = total - stats['lower_bound']
+        avg_score = stats['score_sum'] / scored if scored else 0.0
         
         return {
             'total_evaluations': total,
@@ -149,22 +291,18 @@ class HybridEvaluator:
             'failed': total - passed,
             'pass_rate': passed / total,
             'average_score': avg_score,
+            'lower_bound_scores': stats['lower_bound'],
             'task_type_distribution': self._get_task_type_distribution()
         }
     
     def _get_task_type_distribution(self) -> dict:
         """Get distribution of task types evaluated"""
-        distribution = {}
-        for result in self.evaluation_history:
-            task_type = result['task_type']
-            distribution[task_type] = distribution.get(task_type, 0) + 1
+        total = self._stats['total']
+        if not total:
+            return {}
         
         # Convert to percentages
-        total = len(self.evaluation_history)
-        if total > 0:
-            distribution = {k: v/total for k, v in distribution.items()}
-        
-        return distribution
+        return {k: v/total for k, v in self._stats['type_counts'].items()}
 
 
-__all__ = ['HybridEvaluator', 'FileSystemMonitor', 'VisualStateChecker', 'ProcessVerifier']
\ No newline at end of file
+__all__ = ['HybridEvaluator', 'EvalResult', 'FileSystemMonitor', 'VisualStateChecker', 'ProcessVerifier']
\ No newline at end of file
@@ -3,14 +3,53 @@ File system monitoring for automated evaluation
 """
 
 import os
+import re
+import mmap
 import hashlib
 import time
-from typing import List, Dict, Optional
+import threading
+from collections import deque
+from queue import Empty, SimpleQueue
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from loguru import logger
 
+try:
+    from blake3 import blake3 as _blake3
+except ImportError:  # blake3 is optional, fall back to hashlib's SHA-256
+    _blake3 = None
+
+try:
+    from datasketch import MinHash
+except ImportError:  # datasketch is optional, large texts use exact Jaccard
+    MinHash = None
+
+
+_WORD_RE = re.compile(r'\w+')
+# Texts longer than this are compared with MinHash when available
+_MINHASH_MIN_LENGTH = 64 * 1024
+# Size of the reusable buffer files are hashed through
+_READ_BUFFER_SIZE = 1 << 20
+
+
+def _resolve_hash_algorithm(setting) -> str:
+    """Map the checksum_verification setting to a hash backend name"""
+    if isinstance(setting, str):
+        algorithm = setting.lower()
+        if algorithm == 'blake3' and _blake3 is None:
+            logger.warning("blake3 is not installed, using sha256 for checksums")
+            return 'sha256'
+        return algorithm
+    return 'blake3' if _blake3 is not None else 'sha256'
+
+
+def _snapshot_key(path: str) -> str:
+    """Normalize a path for snapshot lookups"""
+    return os.path.normcase(os.path.normpath(path))
+
 
 class FileSystemMonitor:
     """Monitors and evaluates file system changes"""
@@ -20,11 +59,25 @@ class FileSystemMonitor:
         self.watch_directories = self.config.get('watch_directories', [])
         self.file_types = self.config.get('file_types', [])
         self.check_interval = self.config.get('check_interval', 1.0)
+        # True/False, or a backend name: "blake3", "sha256", "md5"
         self.checksum_verification = self.config.get('checksum_verification', True)
+        self.hash_algorithm = _resolve_hash_algorithm(self.checksum_verification)
+        # Files larger than this only get the exact substring check
+        self.similarity_max_bytes = self.config.get('similarity_max_bytes', 16 * 1024 * 1024)
         
         # File state tracking
         self.file_states = {}
-        self.change_history = []
+        self.change_history = deque(maxlen=self.config.get('history_cap', 10000))
+        # path -> (st_mtime_ns, st_size, digest), reused until the file changes
+        self._hash_cache: Dict[str, Tuple[int, int, str]] = {}
+        # Per-thread read buffers, record_file_states hashes from a pool
+        self._thread_local = threading.local()
+        
+        # Watchdog thread enqueues (timestamp, path, action) tuples; they are
+        # coalesced per path and drained into change_history
+        self._event_queue: SimpleQueue = SimpleQueue()
+        self._flush_stop = threading.Event()
+        self._flush_thread = None
         
         # Initialize watchdog observer
         self.observer = None
@@ -33,13 +86,15 @@ class FileSystemMonitor:
         logger.info(f"File System Monitor initialized for {len(self.watch_directories)} directories")
     
     def evaluate_files(self, expected_files: List[Dict], 
-                      actual_files: List[str]) -> float:
+                      actual_files: List[str],
+                      snapshot: Optional[Dict[str, os.stat_result]] = None) -> float:
         """
         Evaluate file operations against expected outcomes
         
         Args:
             expected_files: List of expected file states
             actual_files: List of actual file paths
+            snapshot: Optional result of snapshot_watched() to reuse
             
         Returns:
             Score between 0 and 1
@@ -47,12 +102,13 @@ class FileSystemMonitor:
         if not expected_files:
             return 1.0  # No file expectations means automatic success
         
-        logger.debug(f"Evaluating {len(expected_files)} file expectations")
+        logger.debug("Evaluating {} file expectations", len(expected_files))
         
         scores = []
+        actual_set = set(actual_files) if actual_files else set()
         
         for expected in expected_files:
-            file_score = self._evaluate_single_file(expected, actual_files)
+            file_score = self._evaluate_single_file(expected, actual_set, snapshot)
             scores.append(file_score)
         
         # Average score across all expected files
@@ -61,7 +117,8 @@ class FileSystemMonitor:
         
         return 0.0
     
-    def _evaluate_single_file(self, expected: Dict, actual_files: List[str]) -> float:
+    def _evaluate_single_file(self, expected: Dict, actual_files: set,
+                              snapshot: Optional[Dict[str, os.stat_result]] = None) -> float:
         """Evaluate a single file expectation"""
         expected_path = expected.get('path')
         expected_operation = expected.get('operation', 'exists')
@@ -70,8 +127,15 @@ class FileSystemMonitor:
         if not expected_path:
             return 0.0
         
-        # Check if file exists
-        file_exists = os.path.exists(expected_path)
+        # One stat serves the existence, ctime and hash-cache checks; prefer
+        # the snapshot and only stat files it doesn't cover
+        st = snapshot.get(_snapshot_key(expected_path)) if snapshot else None
+        if st is None:
+            try:
+                st = os.stat(expected_path)
+            except OSError:
+                st = None
+        file_exists = st is not None
         
         score = 0.0
         
@@ -84,7 +148,7 @@ class FileSystemMonitor:
         elif expected_operation == 'created':
             # Check if file was recently created
             if file_exists:
-                creation_time = os.path.getctime(expected_path)
+                creation_time = st.st_ctime
                 current_time = time.time()
                 # File created within last 5 minutes
                 if current_time - creation_time < 300:
@@ -97,7 +161,7 @@ class FileSystemMonitor:
                 # Check if file was modified
                 if expected_path in self.file_states:
                     old_hash = self.file_states[expected_path].get('hash')
-                    new_hash = self._calculate_file_hash(expected_path)
+                    new_hash = self._calculate_file_hash(expected_path, st)
                     
                     if old_hash and new_hash != old_hash:
                         score = 1.0
@@ -114,35 +178,93 @@ class FileSystemMonitor:
             content_score = self._check_file_content(expected_path, expected_content)
             score = score * 0.7 + content_score * 0.3
         
-        logger.debug(f"File evaluation: {expected_path} -> {score:.2f}")
+        logger.debug("File evaluation: {} -> {:.2f}", expected_path, score)
         return score
     
-    def _calculate_file_hash(self, file_path: str) -> Optional[str]:
-        """Calculate file hash for change detection"""
-        if not os.path.exists(file_path):
-            return None
+    def _calculate_file_hash(self, file_path: str,
+                             st: Optional[os.stat_result] = None) -> Optional[str]:
+        """Calculate file hash for change detection, cached by mtime and size"""
+        if st is None:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                return None
         
+        cached = self._hash_cache.get(file_path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        
+        digest = self._hash_file(file_path)
+        if digest is not None:
+            self._hash_cache[file_path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+    
+    def invalidate_hash(self, file_path: str):
+        """Drop the cached hash of a file that changed on disk"""
+        self._hash_cache.pop(file_path, None)
+    
+    def _hash_file(self, file_path: str) -> Optional[str]:
+        """Hash file contents with the configured backend"""
         try:
-            with open(file_path, 'rb') as f:
-                file_hash = hashlib.md5()
-                chunk = f.read(8192)
-                while chunk:
-                    file_hash.update(chunk)
-                    chunk = f.read(8192)
+            if self.hash_algorithm == 'blake3':
+                # Memory-maps the file and hashes it across all cores
+                file_hash = _blake3(max_threads=_blake3.AUTO)
+                file_hash.update_mmap(file_path)
+                return file_hash.hexdigest()
+            
+            # Read straight into a reused buffer, no per-chunk allocations
+            buffer = self._read_buffer()
+            view = memoryview(buffer)
+            file_hash = hashlib.new(self.hash_algorithm)
+            with open(file_path, 'rb', buffering=0) as f:
+                size = f.readinto(buffer)
+                while size:
+                    file_hash.update(view[:size])
+                    size = f.readinto(buffer)
             return file_hash.hexdigest()
         except Exception as e:
             logger.error(f"Error calculating hash for {file_path}: {e}")
             return None
     
+    def _read_buffer(self) -> bytearray:
+        """Return this thread's reusable read buffer"""
+        buffer = getattr(self._thread_local, 'buffer', None)
+        if buffer is None:
+            buffer = self._thread_local.buffer = bytearray(_READ_BUFFER_SIZE)
+        return buffer
+    
     def _check_file_content(self, file_path: str, expected_content: str) -> float:
         """Check if file contains expected content"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                actual_content = f.read()
+            with open(file_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    # mmap can't map an empty file; only empty content matches it
+                    return 0.0 if expected_content else 1.0
+                
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # Simple content matching, searched as bytes without decoding;
+                    # try the Windows line-ending form of multi-line content too
+                    if mm.find(expected_content.encode('utf-8')) != -1:
+                        return 1.0
+                    if ('\n' in expected_content and
+                            mm.find(expected_content.replace('\n', '\r\n').encode('utf-8')) != -1):
+                        return 1.0
+                    
+                    # Bound the work spent on very large files
+                    if size > self.similarity_max_bytes:
+                        return 0.0
+                    
+                    # Decode from a view of the mapping rather than a bytes copy
+                    with memoryview(mm) as view:
+                        actual_content = str(view, 'utf-8', 'ignore')
             
-            # Simple content matching
-            if expected_content in actual_content:
-                return 1.0
+            # Translate newlines as text-mode reading would, for mixed or
+            # old-Mac line endings
+            if '\r' in actual_content:
+                actual_content = actual_content.replace('\r\n', '\n').replace('\r', '\n')
+                if expected_content in actual_content:
+                    return 1.0
             
             # Calculate similarity
             similarity = self._calculate_text_similarity(expected_content, actual_content)
@@ -158,12 +280,25 @@ class FileSystemMonitor:
             return 0.0
         
         # Convert to sets of words
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
+        words1 = frozenset(_WORD_RE.findall(text1.lower()))
+        words2 = frozenset(_WORD_RE.findall(text2.lower()))
         
         if not words1 or not words2:
             return 0.0
         
+        # Jaccard similarity cannot exceed the ratio of the set sizes; report
+        # anything bounded below 0.1 as no similarity without the set operations
+        size1, size2 = len(words1), len(words2)
+        if min(size1, size2) < 0.1 * max(size1, size2):
+            return 0.0
+        
+        # Estimate Jaccard similarity from signatures for large texts
+        if MinHash is not None and max(len(text1), len(text2)) > _MINHASH_MIN_LENGTH:
+            minhash1, minhash2 = MinHash(num_perm=128), MinHash(num_perm=128)
+            minhash1.update_batch([word.encode('utf-8') for word in words1])
+            minhash2.update_batch([word.encode('utf-8') for word in words2])
+            return minhash1.jaccard(minhash2)
+        
         # Calculate Jaccard similarity
         intersection = len(words1.intersection(words2))
         union = len(words1.union(words2))
@@ -177,6 +312,8 @@ class FileSystemMonitor:
             return
         
         self.event_handler = FileChangeHandler(self)
+        # Observer resolves to the platform's native backend (inotify,
+        # ReadDirectoryChangesW, FSEvents) and only polls as a fallback
         self.observer = Observer()
         
         for directory in self.watch_directories:
@@ -185,6 +322,11 @@ class FileSystemMonitor:
                 logger.info(f"Started monitoring: {directory}")
         
         self.observer.start()
+        
+        self._flush_stop.clear()
+        self._flush_thread = threading.Thread(
+            target=self._flush_loop, name='file-change-flush', daemon=True)
+        self._flush_thread.start()
         logger.info("File system monitoring started")
     
     def stop_monitoring(self):
@@ -193,20 +335,124 @@ class FileSystemMonitor:
             self.observer.stop()
             self.observer.join()
             logger.info("File system monitoring stopped")
+        
+        if self._flush_thread:
+            self._flush_stop.set()
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.drain_changes()
+    
+    def queue_change(self, path: str, action: str):
+        """
+        Queue a file change, collapsing bursts of events on the same path
+        
+        Args:
+            path: Path of the changed file
+            action: "created", "modified" or "deleted"
+        """
+        self._event_queue.put_nowait((time.time(), path, action))
+    
+    def drain_changes(self):
+        """Move queued changes into the change history, one entry per path"""
+        pending = {}
+        while True:
+            try:
+                timestamp, path, action = self._event_queue.get_nowait()
+            except Empty:
+                break
+            
+            previous = pending.pop(path, None)
+            # A file created and then written is still reported as created
+            if previous is not None and previous[2] == 'created' and action == 'modified':
+                action = 'created'
+            pending[path] = (timestamp, path, action)
+        
+        if not pending:
+            return
+        
+        for path in pending:
+            self.invalidate_hash(path)
+        
+        # Entries are re-inserted on every event, so they are in time order
+        self.change_history.extend(
+            {'timestamp': timestamp, 'path': path, 'action': action}
+            for timestamp, path, action in pending.values()
+        )
+    
+    def _flush_loop(self):
+        """Periodically drain queued changes until monitoring stops"""
+        while not self._flush_stop.wait(self.check_interval):
+            self.drain_changes()
     
     def record_file_state(self, file_path: str):
         """Record current state of a file"""
-        if os.path.exists(file_path):
-            self.file_states[file_path] = {
-                'path': file_path,
-                'size': os.path.getsize(file_path),
-                'modified': os.path.getmtime(file_path),
-                'hash': self._calculate_file_hash(file_path) if self.checksum_verification else None
-            }
+        state = self._compute_state(file_path)
+        if state is not None:
+            self.file_states[file_path] = state
+    
+    def record_file_states(self, file_paths: List[str]):
+        """
+        Record the current state of many files, hashing them in parallel
+        
+        Args:
+            file_paths: Paths of the files to record
+        """
+        # hashlib and blake3 release the GIL while hashing large buffers
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for file_path, state in zip(file_paths, executor.map(self._compute_state, file_paths)):
+                if state is not None:
+                    self.file_states[file_path] = state
+    
+    def _compute_state(self, file_path: str) -> Optional[Dict]:
+        """Stat and optionally hash a file, None if it does not exist"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        
+        return {
+            'path': file_path,
+            'size': st.st_size,
+            'modified': st.st_mtime,
+            'hash': self._calculate_file_hash(file_path, st) if self.checksum_verification else None
+        }
+    
+    def snapshot_watched(self) -> Dict[str, os.stat_result]:
+        """
+        Stat every file under the watched directories in one pass
+        
+        Returns:
+            Dictionary mapping normalized file paths to stat results
+        """
+        snapshot = {}
+        stack = list(self.watch_directories)
+        
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError as e:
+                logger.warning("Cannot scan {}: {}", directory, e)
+                continue
+            
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    # Dangling symlinks and files deleted mid-scan are left out
+                    # of the snapshot; lookups fall back to os.stat for them
+                    try:
+                        snapshot[_snapshot_key(entry.path)] = entry.stat()
+                    except OSError:
+                        continue
+        
+        return snapshot
     
     def get_file_changes(self) -> List[Dict]:
         """Get list of file changes detected"""
-        return self.change_history.copy()
+        self.drain_changes()
+        return list(self.change_history)
 
 
 class FileChangeHandler(FileSystemEventHandler):
@@ -215,29 +461,16 @@ class FileChangeHandler(FileSystemEventHandler):
     def __init__(self, monitor):
         self.monitor = monitor
     
-    def on_created(self, event):
+    def _queue(self, event, action: str):
         if not event.is_directory:
-            self.monitor.change_history.append({
-                'timestamp': time.time(),
-                'path': event.src_path,
-                'action': 'created'
-            })
-            logger.debug(f"File created: {event.src_path}")
+            self.monitor.queue_change(event.src_path, action)
+            logger.debug("File {}: {}", action, event.src_path)
+    
+    def on_created(self, event):
+        self._queue(event, 'created')
     
     def on_modified(self, event):
-        if not event.is_directory:
-            self.monitor.change_history.append({
-                'timestamp': time.time(),
-                'path': event.src_path,
-                'action': 'modified'
-            })
-            logger.debug(f"File modified: {event.src_path}")
+        self._queue(event, 'modified')
     
     def on_deleted(self, event):
-        if not event.is_directory:
-            self.monitor.change_history.append({
-                'timestamp': time.time(),
-                'path': event.src_path,
-                'action': 'deleted'
-            })
-            logger.debug(f"File deleted: {event.src_path}")
\ No newline at end of file
+        self._queue(event, 'deleted')
\ No newline at end of file
@@ -10,6 +10,11 @@ import sys
 from pathlib import Path
 from loguru import logger
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib json module
+    orjson = None
+
 # Add project root to path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
@@ -27,7 +32,8 @@ def setup_logging(level: str = "INFO"):
         sys.stderr,
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
         level=level,
-        colorize=True
+        colorize=True,
+        enqueue=True  # Format and write on a background thread
     )
     
     # Add file handler
@@ -40,7 +46,8 @@ def setup_logging(level: str = "INFO"):
         retention="30 days",
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
         level="DEBUG",
-        compression="zip"
+        compression="zip",
+        enqueue=True
     )
 
 
@@ -108,8 +115,12 @@ def parse_arguments():
 def load_tasks_from_file(file_path: str):
     """Load tasks from JSON file"""
     try:
-        with open(file_path, 'r') as f:
-            tasks = json.load(f)
+        if orjson is not None:
+            with open(file_path, 'rb') as f:
+                tasks = orjson.loads(f.read())
+        else:
+            with open(file_path, 'r') as f:
+                tasks = json.load(f)
         
         if isinstance(tasks, list):
             return tasks
@@ -172,8 +183,16 @@ def save_results(result, output_path: str):
             'error_message': result.error_message
         }
         
-        with open(output_path, 'w') as f:
-            json.dump(result_dict, f, indent=2, default=str)
+        if orjson is not None:
+            # orjson serializes straight to bytes, skipping the encode step
+            with open(output_path, 'wb') as f:
+                f.write(orjson.dumps(
+                    result_dict, default=str,
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                ))
+        else:
+            with open(output_path, 'w') as f:
+                json.dump(result_dict, f, indent=2, default=str)
         
         logger.info(f"Results saved to {output_path}")
         
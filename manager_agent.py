@@ -2,11 +2,17 @@
 Manager Agent for instruction decomposition and high-level task management
 """
 
-import json
+import re
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from loguru import logger
 
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    from json import loads as _json_loads
+
 
 @dataclass
 class Subtask:
@@ -19,6 +25,60 @@ class Subtask:
     complexity: float = 0.5
 
 
+# Rule-based decomposition: (required word prefixes, subtask templates), first match wins
+_RULES = (
+    (frozenset({"search", "excel"}), (
+        Subtask(
+            id="search_1",
+            description="Search for information on Chrome",
+            parameters={"query": "extract query from instruction"},
+            dependencies=[],
+            complexity=0.6
+        ),
+        Subtask(
+            id="excel_1",
+            description="Create Excel spreadsheet with results",
+            parameters={"data": "from search_1"},
+            dependencies=["search_1"],
+            complexity=0.7
+        ),
+    )),
+    (frozenset({"word", "format"}), (
+        Subtask(
+            id="open_word",
+            description="Open Word document",
+            parameters={"file_path": "extract from instruction"},
+            dependencies=[],
+            complexity=0.3
+        ),
+        Subtask(
+            id="format_text",
+            description="Format text in Word",
+            parameters={"format_type": "bold/italic/underline"},
+            dependencies=["open_word"],
+            complexity=0.5
+        ),
+    )),
+)
+
+_WORD_RE = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=1024)
+def _match_rule(normalized_instruction: str) -> tuple:
+    """Return the templates of the first rule matching an instruction"""
+    words = set(_WORD_RE.findall(normalized_instruction))
+    
+    # Keywords match at the start of a word, so inflections like "formatting"
+    # count while "password" or "keyword" don't
+    for required_words, templates in _RULES:
+        if all(any(word.startswith(required) for word in words)
+               for required in required_words):
+            return templates
+    
+    return ()
+
+
 class ManagerAgent:
     """Decomposes complex instructions into parameterized subtasks"""
     
@@ -52,45 +112,16 @@ class ManagerAgent:
     
     def _rule_based_decomposition(self, instruction: str) -> List[Subtask]:
         """Rule-based instruction decomposition"""
-        subtasks = []
+        # Repeated instructions (retries, benchmark loops) hit the cache
+        templates = _match_rule(' '.join(instruction.lower().split()))
         
-        # Example decomposition patterns
-        if "search" in instruction.lower() and "excel" in instruction.lower():
-            subtasks = [
-                Subtask(
-                    id="search_1",
-                    description="Search for information on Chrome",
-                    parameters={"query": "extract query from instruction"},
-                    dependencies=[],
-                    complexity=0.6
-                ),
-                Subtask(
-                    id="excel_1",
-                    description="Create Excel spreadsheet with results",
-                    parameters={"data": "from search_1"},
-                    dependencies=["search_1"],
-                    complexity=0.7
-                )
-            ]
-        elif "word" in instruction.lower() and "format" in instruction.lower():
-            subtasks = [
-                Subtask(
-                    id="open_word",
-                    description="Open Word document",
-                    parameters={"file_path": "extract from instruction"},
-                    dependencies=[],
-                    complexity=0.3
-                ),
-                Subtask(
-                    id="format_text",
-                    description="Format text in Word",
-                    parameters={"format_type": "bold/italic/underline"},
-                    dependencies=["open_word"],
-                    complexity=0.5
-                )
-            ]
-        
-        return subtasks
+        # Fresh copies so callers can't mutate the shared templates
+        return [
+            replace(template,
+                    parameters=dict(template.parameters),
+                    dependencies=list(template.dependencies))
+            for template in templates
+        ]
     
     def _llm_based_decomposition(self, instruction: str) -> List[Subtask]:
         """LLM-based instruction decomposition"""
@@ -118,7 +149,7 @@ class ManagerAgent:
         
         try:
             response = self.model_client.generate(prompt)
-            data = json.loads(response)
+            data = _json_loads(response)
             
             subtasks = []
             for subtask_data in data.get("subtasks", []):
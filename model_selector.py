@@ -6,6 +6,10 @@ from typing import Dict, Tuple, Optional
 from loguru import logger
 
 
+# Budget remaining when the status doesn't report one
+_INF = float('inf')
+
+
 class ModelSelector:
     """Selects appropriate model based on complexity and budget"""
     
@@ -14,6 +18,23 @@ class ModelSelector:
         self.models = self._initialize_models(config)
         self.thresholds = config.get('thresholds', {})
         self.fallback_order = config.get('fallback', {}).get('fallback_order', [])
+        
+        # Resolved once; select_model runs on every routing decision
+        self._premium_threshold = self.thresholds.get('premium', 0.8)
+        self._mid_threshold = self.thresholds.get('mid', 0.5)
+        self._open_threshold = self.thresholds.get('open', 0.2)
+        # Built in reverse so duplicates map to their first position, like list.index()
+        self._fallback_index = {
+            name: index for index, name in reversed(list(enumerate(self.fallback_order)))
+        }
+        self._min_costs = {
+            model_type: model_config.get('min_cost_per_call', 0.001)
+            for model_type, model_config in config.get('models', {}).items()
+        }
+        self._costs_per_1k = {
+            model_type: model_config.get('cost_per_1k_tokens', 0)
+            for model_type, model_config in config.get('models', {}).items()
+        }
         logger.info("Model Selector initialized")
     
     def select_model(self, complexity: float, budget_status: Dict) -> Tuple[str, object]:
@@ -29,14 +50,13 @@ class ModelSelector:
         """
         logger.debug(f"Selecting model for complexity: {complexity:.3f}")
         
-        # Get thresholds from config
-        premium_threshold = self.thresholds.get('premium', 0.8)
-        mid_threshold = self.thresholds.get('mid', 0.5)
-        open_threshold = self.thresholds.get('open', 0.2)
+        premium_threshold = self._premium_threshold
+        mid_threshold = self._mid_threshold
+        open_threshold = self._open_threshold
         
         # Check budget constraints
         budget_critical = budget_status.get('is_critical', False)
-        budget_remaining = budget_status.get('remaining', float('inf'))
+        budget_remaining = budget_status.get('remaining', _INF)
         
         # Model selection logic
         if complexity > premium_threshold and not budget_critical:
@@ -87,6 +107,7 @@ class ModelSelector:
             def __init__(self, model_type, config):
                 self.model_type = model_type
                 self.config = config
+                self._cost_per_token = config.get('cost_per_1k_tokens', 0) / 1000
             
             def generate(self, prompt, **kwargs):
                 # Mock response based on model type
@@ -102,22 +123,17 @@ class ModelSelector:
             def get_cost(self, prompt):
                 # Mock cost calculation
                 token_count = len(prompt.split()) * 1.3
-                cost_per_token = config.get('cost_per_1k_tokens', 0) / 1000
-                return token_count * cost_per_token
+                return token_count * self._cost_per_token
         
         return MockClient(model_type, config)
     
     def _can_afford_model(self, model_type: str, budget_remaining: float) -> bool:
         """Check if we can afford to use this model"""
-        model_config = self.config.get('models', {}).get(model_type, {})
-        min_cost = model_config.get('min_cost_per_call', 0.001)
-        
-        return budget_remaining >= min_cost
+        return budget_remaining >= self._min_costs.get(model_type, 0.001)
     
     def get_model_cost(self, model_type: str) -> float:
         """Get cost for using a model"""
-        model_config = self.config.get('models', {}).get(model_type, {})
-        return model_config.get('cost_per_1k_tokens', 0)
+        return self._costs_per_1k.get(model_type, 0)
     
     def get_model_info(self, model_type: str) -> Dict:
         """Get information about a model"""
@@ -129,10 +145,10 @@ class ModelSelector:
     
     def fallback_model(self, current_model: str) -> Optional[str]:
         """Get fallback model for the current model"""
-        if current_model not in self.fallback_order:
+        current_index = self._fallback_index.get(current_model)
+        if current_index is None:
             return None
         
-        current_index = self.fallback_order.index(current_model)
         if current_index < len(self.fallback_order) - 1:
             return self.fallback_order[current_index + 1]
         
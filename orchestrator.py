@@ -3,18 +3,62 @@ Main orchestrator for PC-Agent+ framework
 """
 
 import json
+import os
+import re
 import time
+from collections import Counter
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from loguru import logger
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib json module
+    orjson = None
+
 from .agents import ManagerAgent, ProgressAgent, DecisionAgent, ReflectionAgent
 from .router import RouterAgent
 from .evaluator import HybridEvaluator
 from utils.config_loader import ConfigLoader
 
 
-@dataclass
+# Rule-based actions, listed in priority order when several match
+_RULE_RESULTS = {
+    'click': {'success': True, 'output': 'click_executed', 'action': 'click'},
+    'type': {'success': True, 'output': 'text_typed', 'action': 'type'},
+    'open': {'success': True, 'output': 'application_opened', 'action': 'open'},
+}
+_NO_MATCH_RESULT = {'success': False, 'output': 'no_matching_rule', 'action': 'unknown'}
+# Substring match, like the original `in` checks ("typed", "reopen")
+_RULE_RE = re.compile('|'.join(_RULE_RESULTS))
+
+# Parses the action array out of chatty model responses
+_DECODER = json.JSONDecoder()
+
+# Applications whose processes are expected when an instruction opens them
+_EXPECTED_APPS = ('chrome', 'word', 'excel', 'notepad')
+# Lookahead so overlapping keywords ("savexcel") are all reported
+_EXPECTED_RE = re.compile(
+    '(?=(' + '|'.join(('save', 'create', 'open') + _EXPECTED_APPS) + '))'
+)
+
+
+def _dump_line(entry: Dict) -> bytes:
+    """Serialize one execution history entry as a JSON Lines record"""
+    entry = {**entry, 'result': entry['result'].to_dict()}
+    if orjson is not None:
+        return orjson.dumps(entry, default=str, option=orjson.OPT_NON_STR_KEYS) + b'\n'
+    return json.dumps(entry, default=str).encode('utf-8') + b'\n'
+
+
+def _load_json(data: bytes):
+    """Parse JSON bytes with orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@dataclass(slots=True)
 class ExecutionResult:
     """Result of task execution"""
     success: bool
@@ -24,6 +68,18 @@ class ExecutionResult:
     models_used: Dict[str, int]
     evaluation_scores: Optional[Dict] = None
     error_message: Optional[str] = None
+    
+    def to_dict(self) -> Dict:
+        """Convert to a dictionary; nested containers are shared, not copied"""
+        return {
+            'success': self.success,
+            'subtask_results': self.subtask_results,
+            'total_cost': self.total_cost,
+            'total_time': self.total_time,
+            'models_used': self.models_used,
+            'evaluation_scores': self.evaluation_scores,
+            'error_message': self.error_message
+        }
 
 
 class PCAgentPlus:
@@ -40,6 +96,10 @@ class PCAgentPlus:
         # Execution tracking
         self.execution_history = []
         self.current_task = None
+        self._reset_stats()
+        
+        # Optional JSON Lines file each execution is appended to
+        self.execution_log_path = self.config.get('logging', {}).get('execution_log')
     
     def _initialize_components(self):
         """Initialize all framework components"""
@@ -55,6 +115,18 @@ class PCAgentPlus:
         # Initialize evaluator
         self.evaluator = HybridEvaluator(self.config)
         
+        # Per-token model costs, flattened once for the per-subtask cost path
+        self._cost_per_token = {
+            model_type: model_config.get('cost_per_1k_tokens', 0) / 1000.0
+            for model_type, model_config in self.config.get('models', {}).items()
+        }
+        
+        # Pay any JIT compilation at startup instead of in the first task
+        try:
+            self.evaluator.process_verifier.warm_up()
+        except Exception as e:
+            logger.warning(f"Scoring kernel warm-up failed: {e}")
+        
         logger.info("All components initialized")
     
     def execute(self, instruction: str, budget: Optional[float] = None, 
@@ -89,8 +161,9 @@ class PCAgentPlus:
         }
         
         subtask_results = []
-        models_used = {}
+        models_used = Counter()
         total_cost = 0.0
+        overall_success = True
         
         try:
             # Step 1: Decompose instruction
@@ -103,10 +176,10 @@ class PCAgentPlus:
                 
                 subtask_result = self._execute_subtask(subtask)
                 subtask_results.append(subtask_result)
+                overall_success = overall_success and subtask_result.get('success', False)
                 
                 # Track model usage
-                model_type = subtask_result.get('model_type', 'unknown')
-                models_used[model_type] = models_used.get(model_type, 0) + 1
+                models_used[subtask_result.get('model_type', 'unknown')] += 1
                 
                 # Track cost
                 total_cost += subtask_result.get('cost', 0)
@@ -127,15 +200,12 @@ class PCAgentPlus:
                 instruction, subtask_results
             )
             
-            # Determine overall success
-            overall_success = all(r.get('success', False) for r in subtask_results)
-            
             execution_result = ExecutionResult(
-                success=overall_success,
+                success=bool(overall_success),
                 subtask_results=subtask_results,
                 total_cost=total_cost,
                 total_time=time.time() - start_time,
-                models_used=models_used,
+                models_used=dict(models_used),
                 evaluation_scores=evaluation_result
             )
             
@@ -146,16 +216,21 @@ class PCAgentPlus:
                 subtask_results=subtask_results,
                 total_cost=total_cost,
                 total_time=time.time() - start_time,
-                models_used=models_used,
+                models_used=dict(models_used),
                 error_message=str(e)
             )
         
-        # Store in history
-        self.execution_history.append({
+        # Store in history; the result is serialized only when logged
+        entry = {
             'task': self.current_task,
-            'result': asdict(execution_result),
+            'result': execution_result,
             'timestamp': time.time()
-        })
+        }
+        self.execution_history.append(entry)
+        self._accumulate_stats(execution_result)
+        
+        if self.execution_log_path:
+            self._append_execution_log(entry)
         
         self.current_task = None
         logger.info(f"Execution completed: {'SUCCESS' if execution_result.success else 'FAILURE'}")
@@ -222,32 +297,15 @@ class PCAgentPlus:
         # Simple rule-based execution
         # In production, this would use a proper rule engine
         
-        description = subtask.description.lower()
+        # One scan collects every rule keyword in the description
+        found = set(_RULE_RE.findall(subtask.description.lower()))
         
-        if 'click' in description:
-            return {
-                'success': True,
-                'output': 'click_executed',
-                'action': 'click'
-            }
-        elif 'type' in description:
-            return {
-                'success': True,
-                'output': 'text_typed',
-                'action': 'type'
-            }
-        elif 'open' in description:
-            return {
-                'success': True,
-                'output': 'application_opened',
-                'action': 'open'
-            }
-        else:
-            return {
-                'success': False,
-                'output': 'no_matching_rule',
-                'action': 'unknown'
-            }
+        for action, result in _RULE_RESULTS.items():
+            if action in found:
+                # Copy, callers add per-subtask fields to the result
+                return dict(result)
+        
+        return dict(_NO_MATCH_RESULT)
     
     def _execute_model_based(self, subtask, model_client) -> Dict:
         """Execute using model-based approach"""
@@ -263,8 +321,25 @@ class PCAgentPlus:
             
             response = model_client.generate(prompt)
             
-            # Parse response (simplified)
-            actions = json.loads(response) if '[' in response else []
+            # Parse the first JSON array, ignoring any text around it; a
+            # leading "[Model]" tag isn't JSON, so try each later '[' in turn
+            actions = []
+            error = None
+            start = response.find('[')
+            while start >= 0:
+                try:
+                    actions, _ = _DECODER.raw_decode(response, start)
+                    break
+                except ValueError as e:
+                    error = error or e
+                    start = response.find('[', start + 1)
+            else:
+                if error is not None:
+                    logger.warning(f"Model response contained no valid action array: {error}")
+                    return {
+                        'success': False,
+                        'error': str(error)
+                    }
             
             return {
                 'success': len(actions) > 0,
@@ -281,13 +356,10 @@ class PCAgentPlus:
     
     def _calculate_subtask_cost(self, model_type: str, complexity: float) -> float:
         """Calculate cost for subtask execution"""
-        model_config = self.config.get('models', {}).get(model_type, {})
-        base_cost = model_config.get('cost_per_1k_tokens', 0)
-        
         # Estimate token count based on complexity
         estimated_tokens = complexity * 1000
         
-        return base_cost * (estimated_tokens / 1000)
+        return self._cost_per_token.get(model_type, 0.0) * estimated_tokens
     
     def _evaluate_overall_execution(self, instruction: str, 
                                   subtask_results: List[Dict]) -> Dict:
@@ -313,7 +385,8 @@ class PCAgentPlus:
         # Simplified version
         # In production, this would use NLP to parse expectations
         
-        instruction_lower = instruction.lower()
+        # One scan for every keyword, substring matches like plain `in` checks
+        found = set(_EXPECTED_RE.findall(instruction.lower()))
         
         expected = {
             'files': [],
@@ -321,14 +394,13 @@ class PCAgentPlus:
             'visual_state': {}
         }
         
-        if 'save' in instruction_lower or 'create' in instruction_lower:
+        if 'save' in found or 'create' in found:
             expected['files'].append({'operation': 'created'})
         
-        if 'open' in instruction_lower:
+        if 'open' in found:
             # Extract application name
-            apps = ['chrome', 'word', 'excel', 'notepad']
-            for app in apps:
-                if app in instruction_lower:
+            for app in _EXPECTED_APPS:
+                if app in found:
                     expected['processes'].append({
                         'name': f'{app}.exe',
                         'state': 'running'
@@ -347,52 +419,81 @@ class PCAgentPlus:
             'visual_state': {}             # Would contain screenshots
         }
     
+    def _reset_stats(self):
+        """Clear the running execution aggregates"""
+        # Running aggregates so stats queries don't rescan the history
+        self._stats = {'total': 0, 'successful': 0, 'cost': 0.0, 'time': 0.0,
+                       'model_usage': Counter()}
+    
+    def _accumulate_stats(self, result: ExecutionResult):
+        """Fold one execution result into the running aggregates"""
+        stats = self._stats
+        stats['total'] += 1
+        stats['successful'] += bool(result.success)
+        stats['cost'] += result.total_cost
+        stats['time'] += result.total_time
+        stats['model_usage'].update(result.models_used)
+    
     def get_execution_stats(self) -> Dict:
         """Get execution statistics"""
-        if not self.execution_history:
+        stats = self._stats
+        total = stats['total']
+        if not total:
             return {'total_executions': 0, 'success_rate': 0}
         
-        total = len(self.execution_history)
-        successful = sum(1 for item in self.execution_history 
-                        if item['result']['success'])
-        
-        total_cost = sum(item['result']['total_cost'] 
-                        for item in self.execution_history)
-        
-        total_time = sum(item['result']['total_time'] 
-                        for item in self.execution_history)
-        
-        # Model usage distribution
-        model_usage = {}
-        for item in self.execution_history:
-            for model, count in item['result']['models_used'].items():
-                model_usage[model] = model_usage.get(model, 0) + count
+        successful = stats['successful']
+        total_cost = stats['cost']
+        total_time = stats['time']
         
         return {
             'total_executions': total,
             'successful_executions': successful,
-            'success_rate': successful / total if total > 0 else 0,
+            'success_rate': successful / total,
             'total_cost': total_cost,
-            'average_cost': total_cost / total if total > 0 else 0,
+            'average_cost': total_cost / total,
             'total_time': total_time,
-            'average_time': total_time / total if total > 0 else 0,
-            'model_usage': model_usage
+            'average_time': total_time / total,
+            'model_usage': dict(stats['model_usage'])
         }
     
-    def save_execution_log(self, filepath: str = "execution_log.json"):
-        """Save execution history to file"""
+    def _append_execution_log(self, entry: Dict):
+        """Append one execution to the JSON Lines log"""
         try:
-            with open(filepath, 'w') as f:
-                json.dump(self.execution_history, f, indent=2, default=str)
+            log_dir = os.path.dirname(self.execution_log_path)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            with open(self.execution_log_path, 'ab') as f:
+                f.write(_dump_line(entry))
+        except Exception as e:
+            logger.error(f"Error appending to execution log: {e}")
+    
+    def save_execution_log(self, filepath: str = "execution_log.jsonl"):
+        """Save execution history to file, one JSON record per line"""
+        try:
+            with open(filepath, 'wb') as f:
+                f.writelines(_dump_line(entry) for entry in self.execution_history)
             logger.info(f"Execution log saved to {filepath}")
         except Exception as e:
             logger.error(f"Error saving execution log: {e}")
     
-    def load_execution_log(self, filepath: str = "execution_log.json"):
-        """Load execution history from file"""
+    def load_execution_log(self, filepath: str = "execution_log.jsonl"):
+        """Load execution history from a JSON Lines or legacy JSON array file"""
         try:
-            with open(filepath, 'r') as f:
-                self.execution_history = json.load(f)
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            
+            if data.lstrip().startswith(b'['):
+                history = _load_json(data)
+            else:
+                history = [_load_json(line) for line in data.splitlines() if line.strip()]
+            
+            for entry in history:
+                entry['result'] = ExecutionResult(**entry['result'])
+            self.execution_history = history
+            
+            self._reset_stats()
+            for entry in history:
+                self._accumulate_stats(entry['result'])
             logger.info(f"Execution log loaded from {filepath}")
         except Exception as e:
             logger.error(f"Error loading execution log: {e}")
\ No newline at end of file
@@ -2,11 +2,105 @@
 Process state verification for automated evaluation
 """
 
+import hashlib
+import os
 import psutil
 import time
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 from loguru import logger
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is optional, the scoring kernel runs as plain Python
+    NUMBA_AVAILABLE = False
+
+
+# Attributes every process snapshot includes
+_BASE_ATTRS = frozenset({'pid', 'name', 'status'})
+# Full attribute set, as returned by get_process_info
+_DETAIL_ATTRS = _BASE_ATTRS | {'cpu_percent', 'memory_percent', 'create_time'}
+# Extra attributes each criterion needs; each costs per-process reads
+_CRITERIA_ATTRS = {
+    'max_cpu_percent': 'cpu_percent',
+    'max_memory_percent': 'memory_percent',
+    'min_age_seconds': 'create_time',
+    'executable_hash': 'exe',
+}
+
+
+# Kernel encoding of expected states; anything else scores 0
+_STATE_CODES = {'running': 0, 'not_running': 1}
+_UNKNOWN_STATE = 2
+# Kernel marker for a criterion that was not requested
+_UNSET = float('nan')
+
+
+def _score_kernel(current_count, expected_count, state_code, cpu, mem, age,
+                  max_cpu, max_mem, min_age, extra_met, total_criteria):
+    """
+    Score one expected process from its instance count and criteria
+    
+    Args:
+        current_count: Number of matching processes running
+        expected_count: Number of instances expected
+        state_code: Encoded expected state (see _STATE_CODES)
+        cpu, mem, age: Readings of the first matching process
+        max_cpu, max_mem, min_age: Thresholds, NaN when not requested
+        extra_met: Non-numeric criteria already met (executable hash)
+        total_criteria: Number of criteria given, -1 when there are none
+        
+    Returns:
+        Score between 0 and 1
+    """
+    score = 0.0
+    if state_code == 0:
+        if current_count >= expected_count:
+            # Bonus if exact count matches
+            if current_count == expected_count:
+                score = 1.0
+            else:
+                score = 0.8  # More than expected, but still running
+        elif current_count > 0:
+            score = 0.5  # Some instances running, but not enough
+    elif state_code == 1:
+        if current_count == 0:
+            score = 1.0
+    
+    if current_count == 0 or total_criteria < 0:
+        return score
+    
+    if total_criteria == 0:
+        criteria_score = 1.0
+    else:
+        # NaN thresholds never compare true, so unset criteria are skipped
+        criteria_met = extra_met
+        if max_cpu == max_cpu and cpu <= max_cpu:
+            criteria_met += 1
+        if max_mem == max_mem and mem <= max_mem:
+            criteria_met += 1
+        if min_age == min_age and age >= min_age:
+            criteria_met += 1
+        criteria_score = criteria_met / total_criteria
+    
+    return score * 0.7 + criteria_score * 0.3
+
+
+if NUMBA_AVAILABLE:
+    # cache=True persists the compiled kernel on disk across processes
+    _score_kernel = njit(cache=True)(_score_kernel)
+
+
+@lru_cache(maxsize=256)
+def _hash_for(file_path: str, mtime_ns: int, size: int, algorithm: str) -> str:
+    """Hash a file; mtime and size key the cache so changed files rehash"""
+    file_hash = hashlib.new(algorithm)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
 
 class ProcessVerifier:
     """Verifies process states for automated evaluation"""
@@ -18,8 +112,18 @@ class ProcessVerifier:
         self.allowed_processes = set(self.config.get('allowed_processes', []))
         
         self.process_history = []
+        # (monotonic time, attrs, processes, name index) of the last scan
+        self._snapshot_cache: Optional[Tuple[float, frozenset, List[Dict], Dict[str, List[Dict]]]] = None
+        # Executable digests by (pid, create_time, algorithm); a live PID with
+        # the same start time cannot have exec'd a different binary
+        self._pid_hash_cache: Dict[Tuple[int, float, str], str] = {}
         logger.info("Process Verifier initialized")
     
+    def warm_up(self):
+        """Compile the scoring kernel now rather than on the first evaluation"""
+        if NUMBA_AVAILABLE:
+            _score_kernel(0, 1, 0, 0.0, 0.0, 0.0, _UNSET, _UNSET, _UNSET, 0, -1)
+    
     def evaluate_processes(self, expected_processes: List[Dict], 
                           actual_processes: List[str]) -> float:
         """
@@ -37,21 +141,49 @@ class ProcessVerifier:
         
         logger.debug(f"Evaluating {len(expected_processes)} process expectations")
         
-        scores = []
-        current_processes = self._get_current_processes()
+        processes, process_index = self._snapshot(self._attrs_for(expected_processes))
         
-        for expected in expected_processes:
-            process_score = self._evaluate_single_process(expected, current_processes)
-            scores.append(process_score)
+        if len(expected_processes) == 1:
+            score = self._evaluate_expected(expected_processes[0], process_index)
+        else:
+            # Average score across all expected processes
+            score = sum(self._evaluate_expected(expected, process_index)
+                        for expected in expected_processes) / len(expected_processes)
+        
+        # Forget digests of processes that have exited
+        if self._pid_hash_cache:
+            live_pids = {p.get('pid') for p in processes}
+            for key in [k for k in self._pid_hash_cache if k[0] not in live_pids]:
+                del self._pid_hash_cache[key]
+        
+        return score
+    
+    def _evaluate_expected(self, expected: Dict,
+                           process_index: Dict[str, List[Dict]]) -> float:
+        """Score one expectation, skipping criteria handling when it has none"""
+        if 'criteria' in expected:
+            return self._evaluate_single_process(expected, process_index)
+        return self._evaluate_simple_process(expected, process_index)
+    
+    def _evaluate_simple_process(self, expected: Dict,
+                                 process_index: Dict[str, List[Dict]]) -> float:
+        """Evaluate an expectation on state and count only"""
+        process_name = expected.get('name')
+        if not process_name:
+            return 0.0
         
-        # Average score across all expected processes
-        if scores:
-            return sum(scores) / len(scores)
+        expected_state = expected.get('state', 'running')
+        score = _score_kernel(
+            len(process_index.get(process_name.lower(), ())), expected.get('count', 1),
+            _STATE_CODES.get(expected_state, _UNKNOWN_STATE),
+            0.0, 0.0, 0.0, _UNSET, _UNSET, _UNSET, 0, -1
+        )
         
-        return 0.0
+        logger.debug(f"Process evaluation: {process_name} ({expected_state}) -> {score:.2f}")
+        return score
     
     def _evaluate_single_process(self, expected: Dict, 
-                                current_processes: List[Dict]) -> float:
+                                process_index: Dict[str, List[Dict]]) -> float:
         """Evaluate a single process expectation"""
         process_name = expected.get('name')
         expected_state = expected.get('state', 'running')  # running, not_running
@@ -61,61 +193,86 @@ class ProcessVerifier:
             return 0.0
         
         # Find matching processes
-        matching_processes = []
-        for proc in current_processes:
-            if proc['name'].lower() == process_name.lower():
-                matching_processes.append(proc)
+        matching_processes = process_index.get(process_name.lower(), [])
         
         current_count = len(matching_processes)
         
-        score = 0.0
-        
-        if expected_state == 'running':
-            if current_count >= expected_count:
-                # Bonus if exact count matches
-                if current_count == expected_count:
-                    score = 1.0
-                else:
-                    score = 0.8  # More than expected, but still running
-            elif current_count > 0:
-                score = 0.5  # Some instances running, but not enough
-            else:
-                score = 0.0  # No instances running
+        # Flatten the criteria into kernel scalars
+        criteria = expected.get('criteria')
+        cpu = mem = age = 0.0
+        max_cpu = max_mem = min_age = _UNSET
+        extra_met = 0
+        total_criteria = -1
         
-        elif expected_state == 'not_running':
-            if current_count == 0:
-                score = 1.0
-            else:
-                score = 0.0
+        if matching_processes and criteria is not None:
+            process = matching_processes[0]
+            total_criteria = len(criteria)
+            if 'max_cpu_percent' in criteria:
+                max_cpu = float(criteria['max_cpu_percent'])
+                cpu = float(process.get('cpu_percent') or 0.0)
+            if 'max_memory_percent' in criteria:
+                max_mem = float(criteria['max_memory_percent'])
+                mem = float(process.get('memory_percent') or 0.0)
+            if 'min_age_seconds' in criteria:
+                min_age = float(criteria['min_age_seconds'])
+                age = time.time() - (process.get('create_time') or 0.0)
+            if 'executable_hash' in criteria and self._executable_hash_matches(
+                    process, criteria['executable_hash']):
+                extra_met = 1
         
-        # Check additional criteria if specified
-        if matching_processes and 'criteria' in expected:
-            criteria_score = self._check_process_criteria(
-                matching_processes[0], expected['criteria']
-            )
-            score = score * 0.7 + criteria_score * 0.3
+        score = _score_kernel(
+            current_count, expected_count,
+            _STATE_CODES.get(expected_state, _UNKNOWN_STATE),
+            cpu, mem, age, max_cpu, max_mem, min_age, extra_met, total_criteria
+        )
         
         logger.debug(f"Process evaluation: {process_name} ({expected_state}) -> {score:.2f}")
         return score
     
-    def _get_current_processes(self) -> List[Dict]:
+    def _attrs_for(self, expected_processes: List[Dict]) -> frozenset:
+        """Select the psutil attributes the expectations' criteria need"""
+        attrs = set(_BASE_ATTRS)
+        for expected in expected_processes:
+            for criterion in expected.get('criteria', ()):
+                attr = _CRITERIA_ATTRS.get(criterion)
+                if attr:
+                    attrs.add(attr)
+        
+        if not self.verify_executable_hash:
+            attrs.discard('exe')
+        elif 'exe' in attrs:
+            # Start time keys the per-PID digest cache
+            attrs.add('create_time')
+        return frozenset(attrs)
+    
+    def _get_current_processes(self, attrs: frozenset = _DETAIL_ATTRS) -> List[Dict]:
         """Get list of currently running processes"""
+        return self._snapshot(attrs)[0]
+    
+    def _get_process_index(self, attrs: frozenset = _BASE_ATTRS) -> Dict[str, List[Dict]]:
+        """Get currently running processes keyed by lowercase name"""
+        return self._snapshot(attrs)[1]
+    
+    def _snapshot(self, attrs: frozenset) -> Tuple[List[Dict], Dict[str, List[Dict]]]:
+        """Scan the process table, reusing a scan with enough attrs for check_interval"""
+        now = time.monotonic()
+        cached = self._snapshot_cache
+        if (cached is not None and now - cached[0] < self.check_interval
+                and attrs <= cached[1]):
+            return cached[2], cached[3]
+        
         processes = []
+        index = {}
         
         try:
-            for proc in psutil.process_iter(['pid', 'name', 'status', 'cpu_percent', 
-                                            'memory_percent', 'create_time']):
+            # psutil fills unreadable attributes (e.g. exe) with None
+            for proc in psutil.process_iter(list(attrs)):
                 try:
                     process_info = proc.info
-                    
-                    # Add executable path if allowed
-                    if self.verify_executable_hash:
-                        try:
-                            process_info['exe'] = proc.exe()
-                        except (psutil.AccessDenied, psutil.NoSuchProcess):
-                            process_info['exe'] = None
-                    
                     processes.append(process_info)
+                    # Names are lowercased once here; lookups lower only the query
+                    name = (process_info.get('name') or '').lower()
+                    index.setdefault(name, []).append(process_info)
                     
                 except (psutil.NoSuchProcess, psutil.AccessDenied):
                     continue
@@ -123,99 +280,77 @@ class ProcessVerifier:
         except Exception as e:
             logger.error(f"Error getting processes: {e}")
         
-        return processes
-    
-    def _check_process_criteria(self, process: Dict, criteria: Dict) -> float:
-        """Check process against additional criteria"""
-        score = 0.0
-        criteria_met = 0
-        total_criteria = len(criteria)
-        
-        if total_criteria == 0:
-            return 1.0
-        
-        # Check CPU usage
-        if 'max_cpu_percent' in criteria:
-            max_cpu = criteria['max_cpu_percent']
-            current_cpu = process.get('cpu_percent', 0)
-            if current_cpu <= max_cpu:
-                criteria_met += 1
-        
-        # Check memory usage
-        if 'max_memory_percent' in criteria:
-            max_memory = criteria['max_memory_percent']
-            current_memory = process.get('memory_percent', 0)
-            if current_memory <= max_memory:
-                criteria_met += 1
-        
-        # Check process age
-        if 'min_age_seconds' in criteria:
-            min_age = criteria['min_age_seconds']
-            create_time = process.get('create_time', 0)
-            current_time = time.time()
-            process_age = current_time - create_time
-            if process_age >= min_age:
-                criteria_met += 1
-        
-        # Check executable hash
-        if 'executable_hash' in criteria and self.verify_executable_hash:
-            expected_hash = criteria['executable_hash']
-            exe_path = process.get('exe')
-            if exe_path:
-                actual_hash = self._calculate_file_hash(exe_path)
-                if actual_hash == expected_hash:
-                    criteria_met += 1
-        
-        score = criteria_met / total_criteria
-        return score
+        self._snapshot_cache = (now, attrs, processes, index)
+        return processes, index
     
-    def _calculate_file_hash(self, file_path: str) -> Optional[str]:
-        """Calculate hash of a file (simplified version)"""
+    def invalidate_snapshot(self):
+        """Force the next query to rescan the process table"""
+        self._snapshot_cache = None
+    
+    def _executable_hash_matches(self, process: Dict, expected_hash: str) -> bool:
+        """Check a process executable against an expected digest"""
+        if not self.verify_executable_hash:
+            return False
+        
+        exe_path = process.get('exe')
+        if not exe_path:
+            return False
+        
+        # SHA-256 is canonical; 32 hex digits is a legacy MD5 digest
+        algorithm = 'md5' if len(expected_hash) == 32 else 'sha256'
+        
+        create_time = process.get('create_time')
+        if create_time is None:
+            return self._calculate_file_hash(exe_path, algorithm) == expected_hash
+        
+        key = (process.get('pid'), create_time, algorithm)
+        digest = self._pid_hash_cache.get(key)
+        if digest is None:
+            digest = self._calculate_file_hash(exe_path, algorithm)
+            if digest is not None:
+                self._pid_hash_cache[key] = digest
+        return digest == expected_hash
+    
+    def _calculate_file_hash(self, file_path: str, algorithm: str = 'sha256') -> Optional[str]:
+        """Calculate hash of a file, cached until it changes on disk"""
         try:
-            import hashlib
-            with open(file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+            st = os.stat(file_path)
+            return _hash_for(file_path, st.st_mtime_ns, st.st_size, algorithm)
         except Exception as e:
             logger.error(f"Error calculating hash for {file_path}: {e}")
             return None
     
     def is_process_running(self, process_name: str) -> bool:
         """Check if a specific process is running"""
-        current_processes = self._get_current_processes()
-        for proc in current_processes:
-            if proc['name'].lower() == process_name.lower():
-                return True
-        return False
+        return process_name.lower() in self._get_process_index()
     
     def get_process_count(self, process_name: str) -> int:
         """Get count of running instances of a process"""
-        current_processes = self._get_current_processes()
-        count = 0
-        for proc in current_processes:
-            if proc['name'].lower() == process_name.lower():
-                count += 1
-        return count
+        return len(self._get_process_index().get(process_name.lower(), ()))
     
     def get_process_info(self, process_name: str) -> Optional[Dict]:
         """Get detailed information about a process"""
-        current_processes = self._get_current_processes()
-        for proc in current_processes:
-            if proc['name'].lower() == process_name.lower():
-                return proc
-        return None
+        attrs = _DETAIL_ATTRS | {'exe'} if self.verify_executable_hash else _DETAIL_ATTRS
+        matching = self._get_process_index(attrs).get(process_name.lower())
+        return matching[0] if matching else None
     
     def kill_process(self, process_name: str) -> bool:
         """Kill all instances of a process"""
         try:
             killed = 0
-            for proc in psutil.process_iter():
+            target = process_name.lower()
+            # Prefetch names in one batched read per process
+            for proc in psutil.process_iter(['name', 'pid']):
+                if (proc.info['name'] or '').lower() != target:
+                    continue
                 try:
-                    if proc.name().lower() == process_name.lower():
-                        proc.kill()
-                        killed += 1
+                    proc.kill()
+                    killed += 1
                 except (psutil.NoSuchProcess, psutil.AccessDenied):
                     continue
             
+            if killed:
+                self.invalidate_snapshot()
             logger.info(f"Killed {killed} instances of {process_name}")
             return killed > 0
             
@@ -2,12 +2,24 @@
 Progress Agent for tracking subtask execution progress
 """
 
+import sys
+from collections import defaultdict, deque
+from functools import partial
+from time import monotonic as _now
 from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from loguru import logger
 
 
-@dataclass
+# Interned so comparisons against interned statuses hit the identity fast path
+_COMPLETED = sys.intern("completed")
+_FAILED = sys.intern("failed")
+
+# Serialized field order of ProgressUpdate
+_PROGRESS_FIELDS = ("subtask_id", "step_number", "action", "result", "status", "timestamp")
+
+
+@dataclass(slots=True)
 class ProgressUpdate:
     """Represents a progress update"""
     subtask_id: str
@@ -15,15 +27,25 @@ class ProgressUpdate:
     action: str
     result: str
     status: str  # pending, in_progress, completed, failed
-    timestamp: float
+    timestamp: float  # time.monotonic(), for ordering updates
+    
+    def to_dict(self) -> Dict:
+        """Convert to a dictionary without asdict's recursive copy"""
+        return {field: getattr(self, field) for field in _PROGRESS_FIELDS}
 
 
 class ProgressAgent:
     """Tracks and summarizes progress of subtasks"""
     
-    def __init__(self):
-        self.progress_history: Dict[str, List[ProgressUpdate]] = {}
+    def __init__(self, history_cap: int = 1000):
+        # Most recent updates kept per subtask; counts track what is kept
+        self.history_cap = history_cap
+        self.progress_history: Dict[str, deque] = defaultdict(
+            partial(deque, maxlen=history_cap))
         self.current_progress: Dict[str, str] = {}
+        # Running completed/failed step counts per subtask
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {_COMPLETED: 0, _FAILED: 0})
         logger.info("Progress Agent initialized")
     
     def update_progress(self, subtask_id: str, step_number: int, 
@@ -41,7 +63,9 @@ class ProgressAgent:
         Returns:
             Progress summary string
         """
-        import time
+        # Interned once here, these are reused as dict keys and compared often
+        subtask_id = sys.intern(subtask_id)
+        status = sys.intern(status)
         
         update = ProgressUpdate(
             subtask_id=subtask_id,
@@ -49,19 +73,24 @@ class ProgressAgent:
             action=action,
             result=result,
             status=status,
-            timestamp=time.time()
+            timestamp=_now()
         )
         
-        # Store update
-        if subtask_id not in self.progress_history:
-            self.progress_history[subtask_id] = []
+        # Store update; both lookups create the subtask's entries on first use
+        updates = self.progress_history[subtask_id]
+        counts = self._counts[subtask_id]
+        if len(updates) == self.history_cap and updates[0].status in counts:
+            counts[updates[0].status] -= 1
         
-        self.progress_history[subtask_id].append(update)
+        updates.append(update)
         self.current_progress[subtask_id] = status
         
+        if status in counts:
+            counts[status] += 1
+        
         # Generate summary
         summary = self._generate_summary(subtask_id)
-        logger.debug(f"Progress update: {subtask_id} - {status}")
+        logger.debug("Progress update: {} - {}", subtask_id, status)
         
         return summary
     
@@ -71,19 +100,16 @@ class ProgressAgent:
             return "No progress recorded"
         
         updates = self.progress_history[subtask_id]
-        completed_steps = [u for u in updates if u.status == "completed"]
-        failed_steps = [u for u in updates if u.status == "failed"]
+        counts = self._counts.get(subtask_id, {})
         
-        summary = f"""
-        Subtask: {subtask_id}
-        Status: {self.current_progress.get(subtask_id, 'unknown')}
-        Completed Steps: {len(completed_steps)}
-        Failed Steps: {len(failed_steps)}
-        Total Steps: {len(updates)}
-        Last Action: {updates[-1].action if updates else 'None'}
-        """
-        
-        return summary.strip()
+        return "".join((
+            "Subtask: ", subtask_id,
+            "\nStatus: ", self.current_progress.get(subtask_id, 'unknown'),
+            "\nCompleted Steps: ", str(counts.get(_COMPLETED, 0)),
+            "\nFailed Steps: ", str(counts.get(_FAILED, 0)),
+            "\nTotal Steps: ", str(len(updates)),
+            "\nLast Action: ", updates[-1].action if updates else 'None'
+        ))
     
     def get_progress_summary(self, subtask_id: Optional[str] = None) -> str:
         """
@@ -104,15 +130,11 @@ class ProgressAgent:
         if not self.progress_history:
             return "No progress recorded for any subtask"
         
-        summary_parts = []
-        for sid in self.progress_history:
-            summary_parts.append(self._generate_summary(sid))
-        
-        return "\n\n".join(summary_parts)
+        return "\n\n".join(self._generate_summary(sid) for sid in self.progress_history)
     
     def is_subtask_complete(self, subtask_id: str) -> bool:
         """Check if a subtask is complete"""
-        return self.current_progress.get(subtask_id) == "completed"
+        return self.current_progress.get(subtask_id) == _COMPLETED
     
     def get_failed_steps(self, subtask_id: str) -> List[ProgressUpdate]:
         """Get all failed steps for a subtask"""
@@ -120,4 +142,4 @@ class ProgressAgent:
             return []
         
         return [u for u in self.progress_history[subtask_id] 
-                if u.status == "failed"]
\ No newline at end of file
+                if u.status == _FAILED]
\ No newline at end of file
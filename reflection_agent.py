@@ -3,18 +3,118 @@ Reflection Agent for error detection and feedback
 """
 
 import difflib
-from typing import Dict, Optional, Tuple
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
+import numpy as np
 from loguru import logger
 
+try:
+    from rapidfuzz import fuzz, process as rf_process
+except ImportError:  # rapidfuzz is optional, fall back to difflib
+    fuzz = rf_process = None
 
-@dataclass
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is optional, keyword overlap stays on Python sets
+    NUMBA_AVAILABLE = False
+
+
+# difflib is quadratic in pure Python, so only compare this many characters
+_SIMILARITY_MAX_CHARS = 2048
+# Below this quick_ratio upper bound the full ratio is not worth computing
+_SIMILARITY_CUTOFF = 0.3
+# Screen text shorter than this isn't worth the compiled kernel's dispatch cost
+_KERNEL_MIN_CHARS = 4096
+
+# Marks error detection as still to be done by _reflect
+_NOT_CHECKED = object()
+
+# Serialized field order of ReflectionResult
+_REFLECTION_FIELDS = ("status", "feedback", "suggested_correction", "confidence")
+
+# 64-bit FNV-1a parameters for hashing tokens
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+
+def _token_hashes(buf):
+    """
+    Hash the whitespace-separated tokens of an ASCII byte array
+    
+    Args:
+        buf: uint8 array of the text
+        
+    Returns:
+        Sorted array of unique FNV-1a token hashes
+    """
+    hashes = np.empty(buf.size // 2 + 1, dtype=np.uint64)
+    count = 0
+    h = _FNV_OFFSET
+    in_token = False
+    for i in range(buf.size):
+        b = buf[i]
+        # Same ASCII separators as str.split()
+        if b == 32 or 9 <= b <= 13 or 28 <= b <= 31:
+            if in_token:
+                hashes[count] = h
+                count += 1
+                in_token = False
+        else:
+            if not in_token:
+                h = _FNV_OFFSET
+                in_token = True
+            h = (h ^ np.uint64(b)) * _FNV_PRIME
+    if in_token:
+        hashes[count] = h
+        count += 1
+    return np.unique(hashes[:count])
+
+
+def _token_overlap(actual, expected):
+    """Fraction of expected's distinct tokens that also occur in actual"""
+    actual_hashes = _token_hashes(actual)
+    expected_hashes = _token_hashes(expected)
+    
+    # Merge-walk the two sorted hash arrays
+    i = j = common = 0
+    while i < actual_hashes.size and j < expected_hashes.size:
+        if actual_hashes[i] == expected_hashes[j]:
+            common += 1
+            i += 1
+            j += 1
+        elif actual_hashes[i] < expected_hashes[j]:
+            i += 1
+        else:
+            j += 1
+    return common / max(expected_hashes.size, 1)
+
+
+@lru_cache(maxsize=256)
+def _keyword_set(text: str) -> frozenset:
+    """Distinct whitespace-separated keywords; expected outcomes repeat across attempts"""
+    return frozenset(text.split())
+
+
+if NUMBA_AVAILABLE:
+    _token_hashes = njit(cache=True)(_token_hashes)
+    _token_overlap = njit(cache=True)(_token_overlap)
+
+
+@dataclass(slots=True)
 class ReflectionResult:
     """Result of reflection analysis"""
     status: str  # success, partial_success, failure
     feedback: str
     suggested_correction: Optional[Dict] = None
     confidence: float = 0.0
+    
+    def to_dict(self) -> Dict:
+        """Convert to a dictionary without asdict's recursive copy"""
+        return {field: getattr(self, field) for field in _REFLECTION_FIELDS}
 
 
 class ReflectionAgent:
@@ -23,6 +123,7 @@ class ReflectionAgent:
     def __init__(self, screenshot_comparator=None):
         self.screenshot_comparator = screenshot_comparator
         self.error_patterns = self._load_error_patterns()
+        self._compile_error_patterns()
         logger.info("Reflection Agent initialized")
     
     def reflect_on_action(self, action: Dict, screen_before: str, 
@@ -40,7 +141,43 @@ class ReflectionAgent:
             Reflection result with feedback
         """
         logger.info("Reflecting on action execution...")
+        return self._reflect(screen_before, screen_after, expected_outcome)
+    
+    def reflect_batch(self, actions: List[Dict], screens_before: List[str],
+                      screens_after: List[str],
+                      expected_outcomes: List[str]) -> List[ReflectionResult]:
+        """
+        Reflect on several action executions at once
         
+        Error patterns are found with one regex scan over all screens and
+        outcome similarities with one RapidFuzz call, when it is installed.
+        
+        Args:
+            actions: Actions that were executed
+            screens_before: States before each action
+            screens_after: States after each action
+            expected_outcomes: Expected outcome of each action
+            
+        Returns:
+            Reflection results, as reflect_on_action gives them, in input order
+        """
+        logger.info("Reflecting on {} action executions...", len(actions))
+        
+        screens_lower = [s.lower() if isinstance(s, str) else None for s in screens_after]
+        errors = self._detect_error_patterns_batch(screens_lower)
+        similarities = self._text_similarity_batch(screens_lower, expected_outcomes)
+        
+        return [
+            self._reflect(before, after, expected, lower, error, similarity)
+            for before, after, expected, lower, error, similarity in zip(
+                screens_before, screens_after, expected_outcomes,
+                screens_lower, errors, similarities)
+        ]
+    
+    def _reflect(self, screen_before: str, screen_after: str, expected_outcome: str,
+                 screen_lower: Optional[str] = None, error_detected=_NOT_CHECKED,
+                 similarity: Optional[float] = None) -> ReflectionResult:
+        """Run the reflection checks, reusing any results computed in a batch"""
         # Check for no response
         if self._detect_no_response(screen_before, screen_after):
             return ReflectionResult(
@@ -50,19 +187,24 @@ class ReflectionAgent:
                 confidence=0.9
             )
         
-        # Check for unexpected changes
-        if self.screenshot_comparator:
-            similarity = self.screenshot_comparator.compare(screen_before, screen_after)
-            if similarity < 0.3:  # Major unexpected change
+        # Check for unexpected changes; the same object cannot have changed,
+        # so skip the (expensive) comparator for it
+        if self.screenshot_comparator and screen_before is not screen_after:
+            screen_similarity = self.screenshot_comparator.compare(screen_before, screen_after)
+            if screen_similarity < 0.3:  # Major unexpected change
                 return ReflectionResult(
                     status="failure",
-                    feedback=f"Unexpected screen change detected (similarity: {similarity:.2f})",
+                    feedback=f"Unexpected screen change detected (similarity: {screen_similarity:.2f})",
                     suggested_correction={"revert_and_replan": True},
                     confidence=0.8
                 )
         
         # Check error patterns in screen text
-        error_detected = self._detect_error_patterns(screen_after)
+        if error_detected is _NOT_CHECKED:
+            # Lowercase the screen text once for both text checks below
+            if screen_lower is None and isinstance(screen_after, str):
+                screen_lower = screen_after.lower()
+            error_detected = self._detect_error_patterns(screen_after, screen_lower)
         if error_detected:
             return ReflectionResult(
                 status="failure",
@@ -72,7 +214,8 @@ class ReflectionAgent:
             )
         
         # Check if expected outcome was achieved
-        outcome_match = self._check_expected_outcome(screen_after, expected_outcome)
+        outcome_match = self._check_expected_outcome(screen_after, expected_outcome,
+                                                     screen_lower, similarity)
         
         if outcome_match >= 0.8:
             return ReflectionResult(
@@ -100,6 +243,7 @@ class ReflectionAgent:
         # In production: Compare screenshots pixel-by-pixel
         # For demo: Simple text comparison
         if isinstance(before, str) and isinstance(after, str):
+            # str equality already short-circuits on identity and length
             return before == after
         
         return False
@@ -117,39 +261,139 @@ class ReflectionAgent:
             "crash": "application crash",
         }
     
-    def _detect_error_patterns(self, screen_content: str) -> Optional[str]:
-        """Detect error patterns in screen content"""
-        if not isinstance(screen_content, str):
+    def _compile_error_patterns(self):
+        """Compile all error patterns into one regex, rebuilt when patterns change"""
+        # Frozen (lowercased pattern, description) pairs, matched against lowered text
+        self._pattern_list = tuple((pattern.lower(), description)
+                                   for pattern, description in self.error_patterns.items())
+        # One capture group per pattern; the lookahead reports a match at
+        # every position so the earliest-listed pattern can win
+        self._error_regex = re.compile('(?=(?:' + '|'.join(
+            '(' + re.escape(pattern) + ')' for pattern, _ in self._pattern_list) + '))')
+    
+    def _detect_error_patterns(self, screen_content: str,
+                               screen_lower: Optional[str] = None) -> Optional[str]:
+        """Detect error patterns in screen content, optionally already lowercased"""
+        if not isinstance(screen_content, str) or not self._pattern_list:
             return None
         
-        screen_lower = screen_content.lower()
-        for pattern, description in self.error_patterns.items():
-            if pattern in screen_lower:
-                logger.warning(f"Error pattern detected: {pattern} -> {description}")
-                return description
+        # Patterns are checked in listed order, so keep the lowest-index hit
+        best = None
+        if screen_lower is None:
+            screen_lower = screen_content.lower()
         
-        return None
+        for m in self._error_regex.finditer(screen_lower):
+            if best is None or m.lastindex < best:
+                best = m.lastindex
+                if best == 1:
+                    break
+        
+        if best is None:
+            return None
+        
+        pattern, description = self._pattern_list[best - 1]
+        logger.warning(f"Error pattern detected: {pattern} -> {description}")
+        return description
     
-    def _check_expected_outcome(self, actual: str, expected: str) -> float:
+    def _detect_error_patterns_batch(self, screens_lower: List[Optional[str]]) -> List[Optional[str]]:
+        """Detect error patterns in many lowercased screens with one regex scan"""
+        results = [None] * len(screens_lower)
+        texts = [(i, s) for i, s in enumerate(screens_lower) if s is not None]
+        if not texts or not self._pattern_list:
+            return results
+        
+        # NUL separates the screens; no pattern contains it, so none can
+        # match across two screens
+        starts = []
+        offset = 0
+        for _, text in texts:
+            starts.append(offset)
+            offset += len(text) + 1
+        joined = '\0'.join(text for _, text in texts)
+        
+        best = [None] * len(texts)
+        for m in self._error_regex.finditer(joined):
+            k = bisect_right(starts, m.start()) - 1
+            if best[k] is None or m.lastindex < best[k]:
+                best[k] = m.lastindex
+        
+        for (i, _), group in zip(texts, best):
+            if group is not None:
+                pattern, description = self._pattern_list[group - 1]
+                logger.warning(f"Error pattern detected: {pattern} -> {description}")
+                results[i] = description
+        return results
+    
+    def _check_expected_outcome(self, actual: str, expected: str,
+                                actual_lower: Optional[str] = None,
+                                similarity: Optional[float] = None) -> float:
         """Check how well actual outcome matches expected"""
         if not expected or not actual:
             return 0.0
         
+        if actual_lower is None:
+            actual_lower = actual.lower()
+        expected_lower = expected.lower()
+        
         # Simple string similarity (in production: use more sophisticated methods)
-        similarity = difflib.SequenceMatcher(None, actual.lower(), expected.lower()).ratio()
+        if similarity is None:
+            similarity = self._text_similarity(actual_lower[:_SIMILARITY_MAX_CHARS],
+                                               expected_lower[:_SIMILARITY_MAX_CHARS])
         
-        # Check for keywords
-        expected_keywords = set(expected.lower().split())
-        actual_keywords = set(actual.lower().split())
-        keyword_overlap = len(expected_keywords.intersection(actual_keywords))
-        keyword_similarity = keyword_overlap / max(len(expected_keywords), 1)
+        # Check for keywords; long ASCII screens go through the compiled kernel,
+        # whose separators match str.split() only for ASCII text
+        if (NUMBA_AVAILABLE and len(actual_lower) > _KERNEL_MIN_CHARS
+                and actual_lower.isascii() and expected_lower.isascii()):
+            keyword_similarity = _token_overlap(
+                np.frombuffer(actual_lower.encode('ascii'), dtype=np.uint8),
+                np.frombuffer(expected_lower.encode('ascii'), dtype=np.uint8)
+            )
+        else:
+            expected_keywords = _keyword_set(expected_lower)
+            actual_keywords = set(actual_lower.split())
+            keyword_overlap = len(expected_keywords.intersection(actual_keywords))
+            keyword_similarity = keyword_overlap / max(len(expected_keywords), 1)
         
         # Combine metrics
         combined_similarity = (similarity + keyword_similarity) / 2
         
-        logger.debug(f"Outcome similarity: {combined_similarity:.2f}")
+        logger.debug("Outcome similarity: {:.2f}", combined_similarity)
         return combined_similarity
     
+    def _text_similarity(self, a: str, b: str) -> float:
+        """Similarity ratio in [0, 1], or 0 when below _SIMILARITY_CUTOFF"""
+        if fuzz is not None:
+            # Same normalized ratio family as difflib, computed in C++
+            return fuzz.ratio(a, b, score_cutoff=_SIMILARITY_CUTOFF * 100) / 100.0
+        
+        matcher = difflib.SequenceMatcher(None, a, b)
+        if matcher.quick_ratio() < _SIMILARITY_CUTOFF:
+            return 0.0
+        return matcher.ratio()
+    
+    def _text_similarity_batch(self, screens_lower: List[Optional[str]],
+                               expected_outcomes: List[str]) -> List[Optional[float]]:
+        """Similarity of each screen to its expected outcome, None where not comparable"""
+        results = [None] * len(screens_lower)
+        pairs = [(i, s[:_SIMILARITY_MAX_CHARS], e.lower()[:_SIMILARITY_MAX_CHARS])
+                 for i, (s, e) in enumerate(zip(screens_lower, expected_outcomes))
+                 if s and e]
+        if not pairs:
+            return results
+        
+        if rf_process is not None and hasattr(rf_process, 'cpdist'):
+            # Element-wise scores only, not the full cross matrix
+            scores = rf_process.cpdist(
+                [a for _, a, _ in pairs], [b for _, _, b in pairs],
+                scorer=fuzz.ratio, score_cutoff=_SIMILARITY_CUTOFF * 100, workers=-1
+            )
+            for (i, _, _), score in zip(pairs, scores):
+                results[i] = float(score) / 100.0
+        else:
+            for i, a, b in pairs:
+                results[i] = self._text_similarity(a, b)
+        return results
+    
     def learn_from_feedback(self, action: Dict, reflection: ReflectionResult, 
                            correction_success: bool):
         """Learn from reflection feedback for future improvements"""
@@ -162,4 +406,5 @@ class ReflectionAgent:
             
         # Store pattern for future reference
         key = f"{action.get('type', 'unknown')}_{reflection.status}"
-        self.error_patterns[key] = reflection.feedback[:100]
\ No newline at end of file
+        self.error_patterns[key] = reflection.feedback[:100]
+        self._compile_error_patterns()
\ No newline at end of file
@@ -2,6 +2,10 @@
 Intelligent Router Module for dynamic model selection
 """
 
+from collections import Counter, deque
+
+from loguru import logger
+
 from .complexity_scorer import ComplexityScorer
 from .model_selector import ModelSelector
 from .budget_tracker import BudgetTracker
@@ -16,8 +20,14 @@ class RouterAgent:
         self.budget_tracker = BudgetTracker(config)
         self.model_selector = ModelSelector(config)
         
-        self.routing_history = []
-        print("Router Agent initialized")
+        # Ring buffer of recent decisions; aggregates track what it holds
+        self.routing_history = deque(
+            maxlen=config.get('router', {}).get('history_cap', 10000)
+        )
+        # Running aggregates over routing_history so stats don't rescan it
+        self._model_counts = Counter()
+        self._complexity_sum = 0.0
+        logger.info("Router Agent initialized")
     
     def select_model(self, subtask_description: str, context: dict = None) -> tuple:
         """
@@ -43,13 +53,24 @@ class RouterAgent:
             complexity, budget_status
         )
         
+        # Drop the oldest decision from the aggregates before it is evicted
+        history = self.routing_history
+        if history.maxlen is not None and len(history) == history.maxlen:
+            evicted = history[0]
+            self._model_counts[evicted['model_type']] -= 1
+            if not self._model_counts[evicted['model_type']]:
+                del self._model_counts[evicted['model_type']]
+            self._complexity_sum -= evicted['complexity']
+        
         # Log routing decision
-        self.routing_history.append({
+        history.append({
             'subtask': subtask_description[:50],
             'complexity': complexity,
             'model_type': model_type,
             'budget_remaining': budget_status['remaining']
         })
+        self._model_counts[model_type] += 1
+        self._complexity_sum += complexity
         
         return model_type, model_client, complexity
     
@@ -73,7 +94,7 @@ class RouterAgent:
             cost = self.model_selector.get_model_cost(model_type)
             self.budget_tracker.record_expense(cost)
         
-        print(f"Updated routing: {model_type} {'succeeded' if success else 'failed'}")
+        logger.debug("Updated routing: {} {}", model_type, 'succeeded' if success else 'failed')
     
     def get_routing_stats(self) -> dict:
         """Get routing statistics"""
@@ -87,25 +108,19 @@ class RouterAgent:
     
     def _calculate_model_distribution(self) -> dict:
         """Calculate distribution of model usage"""
-        distribution = {}
-        for decision in self.routing_history:
-            model_type = decision['model_type']
-            distribution[model_type] = distribution.get(model_type, 0) + 1
-        
         # Convert to percentages
         total = len(self.routing_history)
-        if total > 0:
-            distribution = {k: v/total for k, v in distribution.items()}
+        if not total:
+            return {}
         
-        return distribution
+        return {k: v/total for k, v in self._model_counts.items()}
     
     def _calculate_average_complexity(self) -> float:
         """Calculate average complexity score"""
         if not self.routing_history:
             return 0.0
         
-        total = sum(decision['complexity'] for decision in self.routing_history)
-        return total / len(self.routing_history)
+        return self._complexity_sum / len(self.routing_history)
 
 
 __all__ = ['RouterAgent', 'ComplexityScorer', 'ModelSelector', 'BudgetTracker']
\ No newline at end of file
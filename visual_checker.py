@@ -2,23 +2,53 @@
 Visual state verification using screenshot analysis
 """
 
+import threading
 import cv2
 import numpy as np
-from typing import Optional, Tuple, Dict
+from collections import defaultdict
+from typing import Optional, Tuple, Dict, List
 from PIL import Image
 import io
 from loguru import logger
 
+try:
+    from skimage.metrics import structural_similarity
+except ImportError:  # scikit-image is optional, fall back to the OpenCV implementation
+    structural_similarity = None
+
+try:
+    import mss
+except ImportError:  # mss is optional, fall back to pyautogui for captures
+    mss = None
+
 
 class VisualStateChecker:
     """Checks visual state using screenshot comparison"""
     
+    # 11x11 Gaussian window (sigma 1.5) of the standard SSIM formulation
+    _ssim_window = np.outer(cv2.getGaussianKernel(11, 1.5),
+                            cv2.getGaussianKernel(11, 1.5).transpose()).astype(np.float32)
+    
     def __init__(self, config: dict):
         self.config = config.get('visual', {})
         self.similarity_method = self.config.get('similarity_method', 'ssim')
         self.ssim_threshold = self.config.get('ssim_threshold', 0.85)
         self.mse_threshold = self.config.get('mse_threshold', 0.1)
         self.screenshot_delay = self.config.get('screenshot_delay', 1.0)
+        # Longest side screenshots are shrunk to before comparison (0 disables)
+        self.max_dim = self.config.get('max_dim', 480)
+        # dHash bit distance above which screenshots score 0 without SSIM (None disables)
+        self.dhash_threshold = self.config.get('dhash_threshold', 20)
+        # 'opencv' (default) or 'skimage'; both compute the same Gaussian SSIM
+        self.ssim_backend = self.config.get('ssim_backend', 'opencv')
+        if self.ssim_backend == 'skimage' and structural_similarity is None:
+            logger.warning("scikit-image not available, using OpenCV SSIM")
+            self.ssim_backend = 'opencv'
+        # SSIM scratch buffers, reused while screenshot shapes stay the same
+        self._ssim_scratch: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        # Screen grabbers, one per thread (mss handles aren't thread-safe),
+        # opened on each thread's first capture
+        self._local = threading.local()
         
         logger.info(f"Visual State Checker initialized (method: {self.similarity_method})")
     
@@ -80,10 +110,22 @@ class VisualStateChecker:
         if img1 is None or img2 is None:
             return 0.0
         
+        # UI structure survives thumbnailing, and SSIM/MSE cost scales with pixels
+        if self.max_dim:
+            img1 = self._downscale(img1)
+            img2 = self._downscale(img2)
+        
         # Resize to same dimensions if needed
         if img1.shape != img2.shape:
             img2 = cv2.resize(img2, (img1.shape[1], img1.shape[0]))
         
+        # Cheap perceptual-hash screen: clearly different screens skip the full comparison
+        if self.dhash_threshold is not None:
+            distance = (self._dhash(img1) ^ self._dhash(img2)).bit_count()
+            if distance > self.dhash_threshold:
+                logger.debug(f"dHash distance {distance} exceeds threshold, skipping comparison")
+                return 0.0
+        
         # Calculate similarity based on selected method
         if self.similarity_method == 'ssim':
             return self._calculate_ssim(img1, img2)
@@ -100,6 +142,28 @@ class VisualStateChecker:
             logger.warning(f"Unknown similarity method: {self.similarity_method}")
             return self._calculate_ssim(img1, img2)
     
+    def _downscale(self, img: np.ndarray) -> np.ndarray:
+        """Shrink an image so its longest side is at most max_dim"""
+        scale = self.max_dim / max(img.shape[:2])
+        if scale >= 1:
+            return img
+        return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    def _dhash(self, img: np.ndarray) -> int:
+        """
+        64-bit difference hash of an image
+        
+        Args:
+            img: Grayscale or BGR image
+            
+        Returns:
+            Hash whose bits mark where brightness rises left to right on a 9x8 thumbnail
+        """
+        thumb = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        return int.from_bytes(np.packbits(thumb[:, 1:] > thumb[:, :-1]).tobytes(), 'big')
+    
     def _load_image(self, img_input):
         """Load image from various input types"""
         if isinstance(img_input, np.ndarray):
@@ -114,7 +178,7 @@ class VisualStateChecker:
                 logger.error(f"Error loading image from {img_input}: {e}")
         elif isinstance(img_input, Image.Image):
             # Convert PIL Image to OpenCV
-            img_array = np.array(img_input)
+            img_array = np.asarray(img_input)
             if len(img_array.shape) == 3:
                 return cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
             else:
@@ -130,15 +194,24 @@ class VisualStateChecker:
                 logger.warning(f"Image shapes differ: {img1.shape} vs {img2.shape}")
                 return 0.0
             
-            # Calculate SSIM
-            C1 = (0.01 * 255) ** 2
-            C2 = (0.03 * 255) ** 2
+            if self.ssim_backend == 'skimage':
+                return float(structural_similarity(
+                    img1, img2, data_range=255, gaussian_weights=True, sigma=1.5,
+                    use_sample_covariance=False,
+                    channel_axis=-1 if img1.ndim == 3 else None
+                ))
+            
+            # Calculate SSIM; float32 is ample for 8-bit input and halves the bandwidth
+            C1 = np.float32((0.01 * 255) ** 2)
+            C2 = np.float32((0.03 * 255) ** 2)
             
-            img1 = img1.astype(np.float64)
-            img2 = img2.astype(np.float64)
+            # Centre the pixels so E[x^2] - mu^2 doesn't lose the variances to
+            # float32 rounding; (co)variances are unaffected by the shift
+            img1 = np.subtract(img1, 128, dtype=np.float32)
+            img2 = np.subtract(img2, 128, dtype=np.float32)
             
-            kernel = cv2.getGaussianKernel(11, 1.5)
-            window = np.outer(kernel, kernel.transpose())
+            window = self._ssim_window
+            product, filtered = self._ssim_buffers(img1.shape)
             
             mu1 = cv2.filter2D(img1, -1, window)[5:-5, 5:-5]
             mu2 = cv2.filter2D(img2, -1, window)[5:-5, 5:-5]
@@ -146,19 +219,54 @@ class VisualStateChecker:
             mu2_sq = mu2 ** 2
             mu1_mu2 = mu1 * mu2
             
-            sigma1_sq = cv2.filter2D(img1 ** 2, -1, window)[5:-5, 5:-5] - mu1_sq
-            sigma2_sq = cv2.filter2D(img2 ** 2, -1, window)[5:-5, 5:-5] - mu2_sq
-            sigma12 = cv2.filter2D(img1 * img2, -1, window)[5:-5, 5:-5] - mu1_mu2
+            # Products and their filtered versions go through the scratch
+            # buffers; only the cropped differences are new arrays
+            np.multiply(img1, img1, out=product)
+            sigma1_sq = cv2.filter2D(product, -1, window, dst=filtered)[5:-5, 5:-5] - mu1_sq
+            np.multiply(img2, img2, out=product)
+            sigma2_sq = cv2.filter2D(product, -1, window, dst=filtered)[5:-5, 5:-5] - mu2_sq
+            np.multiply(img1, img2, out=product)
+            sigma12 = cv2.filter2D(product, -1, window, dst=filtered)[5:-5, 5:-5] - mu1_mu2
             
-            ssim_map = ((2 * mu1_mu2 + C1) * (2 * sigma12 + C2)) / \
-                      ((mu1_sq + mu2_sq + C1) * (sigma1_sq + sigma2_sq + C2))
+            # Undo the centring for the luminance term
+            mu1 += 128
+            mu2 += 128
+            np.multiply(mu1, mu1, out=mu1_sq)
+            np.multiply(mu2, mu2, out=mu2_sq)
+            np.multiply(mu1, mu2, out=mu1_mu2)
             
-            return np.mean(ssim_map)
+            # ssim_map = ((2*mu1_mu2 + C1) * (2*sigma12 + C2)) /
+            #            ((mu1_sq + mu2_sq + C1) * (sigma1_sq + sigma2_sq + C2)),
+            # evaluated in place
+            numerator = mu1_mu2
+            numerator *= 2
+            numerator += C1
+            sigma12 *= 2
+            sigma12 += C2
+            numerator *= sigma12
+            
+            denominator = mu1_sq
+            denominator += mu2_sq
+            denominator += C1
+            sigma1_sq += sigma2_sq
+            sigma1_sq += C2
+            denominator *= sigma1_sq
+            
+            numerator /= denominator
+            return float(np.mean(numerator))
             
         except Exception as e:
             logger.error(f"Error calculating SSIM: {e}")
             return 0.0
     
+    def _ssim_buffers(self, shape: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """Get (product, filtered) float32 scratch arrays of the given shape"""
+        scratch = self._ssim_scratch
+        if scratch is None or scratch[0].shape != shape:
+            scratch = (np.empty(shape, dtype=np.float32), np.empty(shape, dtype=np.float32))
+            self._ssim_scratch = scratch
+        return scratch
+    
     def _calculate_mse(self, img1, img2) -> float:
         """Calculate Mean Squared Error (MSE)"""
         try:
@@ -166,10 +274,8 @@ class VisualStateChecker:
                 logger.warning(f"Image shapes differ for MSE: {img1.shape} vs {img2.shape}")
                 return float('inf')
             
-            err = np.sum((img1.astype("float") - img2.astype("float")) ** 2)
-            err /= float(img1.shape[0] * img1.shape[1])
-            
-            return err
+            # Sum of squared differences straight on the uint8 data
+            return cv2.norm(img1, img2, cv2.NORM_L2SQR) / float(img1.shape[0] * img1.shape[1])
             
         except Exception as e:
             logger.error(f"Error calculating MSE: {e}")
@@ -181,18 +287,16 @@ class VisualStateChecker:
         if not expected_elements:
             return 1.0
         
-        matches = 0
+        # Lowercase the actual texts once, bucketed by element type
+        actual_by_type = defaultdict(list)
+        for actual in actual_elements:
+            actual_by_type[actual.get('type')].append(actual.get('text', '').lower())
         
+        matches = 0
         for expected in expected_elements:
-            element_type = expected.get('type')
-            element_text = expected.get('text', '')
-            
-            # Look for matching element in actual elements
-            for actual in actual_elements:
-                if (actual.get('type') == element_type and 
-                    element_text.lower() in actual.get('text', '').lower()):
-                    matches += 1
-                    break
+            element_text = expected.get('text', '').lower()
+            if any(element_text in text for text in actual_by_type.get(expected.get('type'), ())):
+                matches += 1
         
         return matches / len(expected_elements) if expected_elements else 0.0
     
@@ -229,22 +333,48 @@ class VisualStateChecker:
         
         return sum(scores) / len(scores) if scores else 0.0
     
-    def capture_screenshot(self, region: Optional[Tuple] = None) -> Optional[np.ndarray]:
-        """Capture screenshot of specified region"""
-        try:
-            import pyautogui
+    def capture_screenshot(self, region: Optional[Tuple] = None,
+                           grayscale: bool = False) -> Optional[np.ndarray]:
+        """
+        Capture screenshot of specified region
+        
+        Args:
+            region: Optional (left, top, width, height) to capture
+            grayscale: Return a single-channel image, as used for comparison
             
-            if region:
-                screenshot = pyautogui.screenshot(region=region)
+        Returns:
+            BGR (or grayscale) image, or None on failure
+        """
+        try:
+            if mss is not None:
+                sct = getattr(self._local, 'sct', None)
+                if sct is None:
+                    sct = self._local.sct = mss.mss()
+                if region:
+                    left, top, width, height = region
+                    monitor = {'left': left, 'top': top, 'width': width, 'height': height}
+                else:
+                    # Primary monitor, as pyautogui captures; monitors[0] spans all of them
+                    monitor = sct.monitors[1]
+                # View the raw BGRA buffer and convert in a single pass
+                raw = np.asarray(sct.grab(monitor))
+                code = cv2.COLOR_BGRA2GRAY if grayscale else cv2.COLOR_BGRA2BGR
             else:
-                screenshot = pyautogui.screenshot()
+                import pyautogui
+                
+                if region:
+                    screenshot = pyautogui.screenshot(region=region)
+                else:
+                    screenshot = pyautogui.screenshot()
+                raw = np.asarray(screenshot)
+                code = cv2.COLOR_RGB2GRAY if grayscale else cv2.COLOR_RGB2BGR
             
             # Convert to OpenCV format
-            screenshot_cv = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+            screenshot_cv = cv2.cvtColor(raw, code)
             
             logger.debug(f"Screenshot captured: {screenshot_cv.shape}")
             return screenshot_cv
             
         except Exception as e:
             logger.error(f"Error capturing screenshot: {e}")
-            return None
\ No newline at end of file
+            return None